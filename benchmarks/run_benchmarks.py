@@ -0,0 +1,207 @@
+"""
+End-to-end benchmarks of the agent loop against local fixture pages and a scripted stub model.
+
+Runs every scenario in `scenarios.py` in plan and script mode and prints (or writes) a JSON report
+with wall time per turn, time spent in browser actions and screenshot capture/encoding, bytes
+uploaded per model request and, for the whole run, peak RSS of the Python process, so runs on
+different branches can be compared:
+
+    python benchmarks/run_benchmarks.py --output before.json
+"""
+import argparse
+import asyncio
+import contextlib
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Any
+
+from playwright.async_api import async_playwright, Browser
+
+from scenarios import SCENARIOS, Scenario
+from stub_server import RUN_HEADER, StubServer
+
+REPO_DIR = Path(__file__).resolve().parent.parent
+SRC_DIR = REPO_DIR / "src"
+INVOCATION_DIR = Path.cwd()
+
+# The agent resolves its output directories relative to src/, like main.py
+os.chdir(SRC_DIR)
+sys.path.insert(0, str(SRC_DIR))
+
+from loops.agent_loop import test_gen_loop, PromptType  # noqa: E402
+from loops.providers import APIProvider, ProviderConfig, create_client  # noqa: E402
+from loops.routing import ModelTiers  # noqa: E402
+from tools.locator_cache import LocatorCache  # noqa: E402
+from util.metrics import collect_metrics  # noqa: E402
+
+
+async def run_scenario(
+        scenario: Scenario,
+        mode: PromptType,
+        server: StubServer,
+        browser: Browser,
+        work_dir: Path,
+        stream: bool,
+        provider: APIProvider
+) -> dict[str, Any]:
+    """Run one scenario against the stub model and return its measurements."""
+    run_key = f"{scenario.name}-{mode}"
+    output_dir = work_dir / "output" / run_key
+    output_dir.mkdir(parents=True, exist_ok=True)
+    server.add_run(run_key, scenario.turns(str(mode), str(output_dir)))
+
+    # Bedrock requests authenticate with the api key as a bearer token, so no AWS credentials are needed
+    provider_config = ProviderConfig(provider, base_url=server.url, aws_region="us-east-1")
+    client = create_client(provider_config, api_key="benchmark", default_headers={RUN_HEADER: run_key})
+    models = provider_config.models
+    try:
+        with collect_metrics() as metrics:
+            start = time.perf_counter()
+            result = await test_gen_loop(
+                f"{server.url}/{scenario.fixture}",
+                scenario.instructions,
+                prompt_type=mode,
+                browser=browser,
+                screenshot_dir=work_dir / "screenshots",
+                provider=provider_config,
+                client=client,
+                stream=stream,
+                record_trajectory=False,
+                trace_dir=work_dir / "traces",
+                output_dir=output_dir,
+                locator_cache=LocatorCache(work_dir / "locators"),
+                # The stub plays back a fixed conversation, which a verification turn would run past
+                models=ModelTiers(models.strong, models.strong),
+            )
+            wall_time = time.perf_counter() - start
+    finally:
+        await client.close()
+
+    summary = metrics.summary()
+    timings = summary["timings"]
+    request_bytes = [request.bytes for request in server.runs[run_key].requests]
+
+    def total(prefix: str) -> float:
+        return sum(timing["total"] for name, timing in timings.items() if name.startswith(prefix))
+
+    return {
+        "scenario": scenario.name,
+        "mode": str(mode),
+        "passed": result.passed,
+        "status": str(result.status),
+        "wall_time": wall_time,
+        "turns": len(request_bytes),
+        "turn_times": timings.get("turn", {}).get("values", []),
+        "api_time": total("api."),
+        # browser.* spans also cover startup and teardown, the page observation nested in
+        # page-changing actions and each step of a batch besides the batch, so only the spans of
+        # whole tool calls add up to the time spent in actions
+        "browser_action_time": total("tool.browser"),
+        # Per action; steps of a batch count under their own action as well as under "batch"
+        "browser_actions": {
+            name.removeprefix("browser."): {"count": timing["count"], "total": timing["total"]}
+            for name, timing in timings.items()
+            if name.startswith("browser.") and name not in ("browser.start", "browser.close", "browser.observe")
+        },
+        "screenshot_capture_time": total("screenshot.capture"),
+        "screenshot_encode_time": total("screenshot.compare") + total("screenshot.encode"),
+        "screenshot_write_time": total("screenshot.write"),
+        "request_bytes": request_bytes,
+        "uploaded_bytes": sum(request_bytes),
+        "usage": result.usage.to_dict(),
+    }
+
+
+async def run_benchmarks(args: argparse.Namespace) -> dict[str, Any]:
+    """Run the selected scenarios in the selected modes, one at a time, on a shared headless browser."""
+    scenarios = [s for s in SCENARIOS if not args.scenario or s.name in args.scenario]
+    modes = [PromptType(mode) for mode in args.mode]
+    server = StubServer(latency=args.latency, block_latency=args.block_latency).start()
+
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as work_dir:
+            async with async_playwright() as playwright:
+                browser = await playwright.chromium.launch(headless=True)
+                try:
+                    for _ in range(args.repeat):
+                        for scenario in scenarios:
+                            for mode in modes:
+                                results.append(await run_scenario(
+                                    scenario, mode, server, browser, Path(work_dir), args.stream, APIProvider(args.provider)
+                                ))
+                finally:
+                    await browser.close()
+    finally:
+        server.stop()
+
+    return {
+        "environment": {
+            "commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+        },
+        "settings": {
+            "stream": args.stream,
+            "provider": args.provider,
+            "latency": args.latency,
+            "block_latency": args.block_latency,
+            "repeat": args.repeat,
+        },
+        "results": results,
+        # Peak of the benchmark's own process over all scenarios, without Chromium; the kernel
+        # only tracks the maximum, so there is no per-scenario figure
+        "python_peak_rss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Benchmark the agent loop against local fixtures and a stub model")
+    parser.add_argument("--scenario", action="append", help="Only run this scenario (repeatable)")
+    parser.add_argument(
+        "--mode", action="append", choices=[p.value for p in PromptType],
+        help="Only run this mode (repeatable, default: all)",
+    )
+    parser.add_argument("--stream", action="store_true", help="Use streaming responses")
+    parser.add_argument(
+        "--provider", choices=[p.value for p in APIProvider], default=APIProvider.ANTHROPIC.value,
+        help="Client the stub model is called through (default: anthropic)",
+    )
+    parser.add_argument("--latency", type=float, default=0.0, help="Simulated model latency to first byte (seconds)")
+    parser.add_argument("--block-latency", type=float, default=0.0, help="Simulated generation time per content block (seconds)")
+    parser.add_argument("--repeat", type=int, default=1, help="Number of times to run every scenario")
+    parser.add_argument("--output", help="Write the JSON report to this file instead of stdout")
+    args = parser.parse_args()
+    args.mode = args.mode or [p.value for p in PromptType]
+    return args
+
+
+def main():
+    args = parse_args()
+    # Keep the agent's progress output off stdout, which carries the report
+    with contextlib.redirect_stdout(sys.stderr):
+        report = asyncio.run(run_benchmarks(args))
+    if args.output:
+        (INVOCATION_DIR / args.output).write_text(json.dumps(report, indent=2))
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
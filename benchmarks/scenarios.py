@@ -0,0 +1,109 @@
+"""Scripted benchmark scenarios: a fixture page, test instructions and the turns the stub model plays back."""
+from dataclasses import dataclass
+from typing import Any
+
+# Fixture coordinates below are CSS pixels on the default 1920x1080 viewport. The model acts in
+# screenshot pixels, which the default screenshot config scales to 1280 wide.
+SCREENSHOT_SCALE = 1280 / 1920
+
+
+def at(x: int, y: int) -> dict[str, int]:
+    """Convert viewport coordinates to the screenshot coordinates the model would use."""
+    return {"x": round(x * SCREENSHOT_SCALE), "y": round(y * SCREENSHOT_SCALE)}
+
+
+def browser(action: str, **params: Any) -> dict[str, Any]:
+    return {"type": "tool_use", "name": "browser", "input": {"action": action, **params}}
+
+
+def write_file(path: str, content: str) -> dict[str, Any]:
+    return {"type": "tool_use", "name": "script_writer", "input": {"action": "write", "path": path, "content": content}}
+
+
+def text(value: str) -> dict[str, Any]:
+    return {"type": "text", "text": value}
+
+
+@dataclass
+class Scenario:
+    """A benchmark scenario.
+
+    `actions` are the browser turns shared by both modes; the final turns are added per mode by
+    `turns`. In plan mode the plan is written in an extra turn; in script mode the `assertions`
+    are checked in the last browser turn and the script is generated from the run.
+    """
+    name: str
+    fixture: str
+    instructions: str
+    actions: list[list[dict[str, Any]]]
+    assertions: list[dict[str, Any]]
+
+    def turns(self, mode: str, output_dir: str) -> list[list[dict[str, Any]]]:
+        """All turns the stub model plays back for this scenario in `mode` ('plan' or 'script')."""
+        if mode != "plan":
+            return [*self.actions[:-1], [*self.actions[-1], *self.assertions], [text("Success")]]
+        steps = "\n".join(
+            f"{block['input']['action']} {block['input']}"
+            for turn in self.actions for block in turn if block["type"] == "tool_use"
+        )
+        final = write_file(
+            f"{output_dir}/plan_{self.name}.txt",
+            f"Website: {self.fixture}\nInstructions: {self.instructions}\n{steps}\n",
+        )
+        return [*self.actions, [text("Writing the results."), final], [text("Success")]]
+
+
+SCENARIOS = [
+    Scenario(
+        name="form",
+        fixture="form.html",
+        instructions="Fill in the signup form with name 'Ada' and email 'ada@example.com', accept the terms, submit and verify the thank you message.",
+        actions=[
+            [text("Let me look at the page."), browser("screenshot")],
+            [
+                browser("click", **at(600, 175)),
+                browser("type", text="Ada"),
+                browser("click", **at(600, 275)),
+                browser("type", text="ada@example.com"),
+                browser("click", **at(320, 375)),
+                browser("click", **at(400, 480)),
+            ],
+            [browser("screenshot"), browser("get_title")],
+        ],
+        assertions=[browser("assert", assertion="text", text="Thanks, Ada!", **at(330, 575))],
+    ),
+    Scenario(
+        name="search",
+        fixture="search.html",
+        instructions="Search for 'lofi music' and verify search results appear.",
+        actions=[
+            [browser("screenshot")],
+            [browser("click", **at(600, 125)), browser("type", text="lofi music"), browser("key", text="return")],
+            [browser("screenshot"), browser("get_content")],
+        ],
+        assertions=[browser("assert", assertion="visible", **at(600, 200))],
+    ),
+    Scenario(
+        name="infinite_scroll",
+        fixture="infinite_scroll.html",
+        instructions="Scroll down the feed and verify more posts are loaded.",
+        actions=[
+            [browser("screenshot")],
+            [browser("scroll", x=0, y=1500), browser("screenshot")],
+            [browser("scroll", x=0, y=1500), browser("screenshot")],
+            [browser("get_content")],
+        ],
+        assertions=[browser("assert", assertion="title", text="Infinite Feed")],
+    ),
+    Scenario(
+        name="spa",
+        fixture="spa.html",
+        instructions="Navigate to the Products and About pages and verify each view renders.",
+        actions=[
+            [browser("screenshot")],
+            [browser("click", **at(400, 50)), browser("screenshot")],
+            [browser("click", **at(600, 50)), browser("get_title"), browser("screenshot")],
+        ],
+        assertions=[browser("assert", assertion="title", text="About")],
+    ),
+]
@@ -0,0 +1,188 @@
+"""Local HTTP server serving the fixture pages and a scripted stand-in for the Messages API."""
+import base64
+import json
+import re
+import struct
+import threading
+import time
+import zlib
+from dataclasses import dataclass, field
+from functools import partial
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any
+from urllib.parse import unquote
+
+FIXTURES_DIR = Path(__file__).parent / "fixtures"
+
+# Header the benchmark client sends to say which scripted run a request belongs to
+RUN_HEADER = "x-benchmark-run"
+
+# Bedrock's InvokeModel and InvokeModelWithResponseStream endpoints
+BEDROCK_PATH = re.compile(r"/model/([^/]+)/invoke(-with-response-stream)?")
+
+
+@dataclass
+class RequestRecord:
+    """A request received by the stub model."""
+    turn: int
+    bytes: int
+    received_at: float
+
+
+@dataclass
+class ScriptedRun:
+    """The turns the stub model plays back for one run, and the requests it received."""
+    turns: list[list[dict[str, Any]]]
+    requests: list[RequestRecord] = field(default_factory=list)
+
+
+class StubServer:
+    """
+    Serves `fixtures/` over HTTP and answers `POST /v1/messages` with scripted turns.
+
+    The turn played back is the number of assistant messages already in the request, so runs
+    are stateless on the server side. Both plain and streaming (SSE) requests are supported, as
+    are Bedrock's `POST /model/<model>/invoke` and `/invoke-with-response-stream` (AWS event
+    stream) endpoints, so runs can use a Bedrock client pointed at the stub.
+    `latency` is waited before the first byte of every response and `block_latency` before each
+    content block, simulating time to first token and generation time.
+    """
+
+    def __init__(self, latency: float = 0.0, block_latency: float = 0.0):
+        self.latency = latency
+        self.block_latency = block_latency
+        self.runs: dict[str, ScriptedRun] = {}
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), partial(_Handler, self))
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubServer":
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def add_run(self, run_key: str, turns: list[list[dict[str, Any]]]) -> None:
+        """Register the scripted turns for a run."""
+        self.runs[run_key] = ScriptedRun(turns)
+
+    def next_turn(self, run_key: str, body: dict[str, Any], size: int) -> tuple[int, list[dict[str, Any]]]:
+        """Record a request and return the index and content of the turn to play back."""
+        run = self.runs[run_key]
+        turn = sum(1 for message in body["messages"] if message["role"] == "assistant")
+        with self._lock:
+            run.requests.append(RequestRecord(turn=turn, bytes=size, received_at=time.time()))
+        blocks = [dict(block) for block in run.turns[min(turn, len(run.turns) - 1)]]
+        for index, block in enumerate(blocks):
+            if block["type"] == "tool_use":
+                block["id"] = f"toolu_{turn:03d}_{index:02d}"
+        return turn, blocks
+
+
+class _Handler(SimpleHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def __init__(self, server: StubServer, *args, **kwargs):
+        self.stub = server
+        super().__init__(*args, directory=str(FIXTURES_DIR), **kwargs)
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_POST(self):
+        path = self.path.split("?")[0]
+        bedrock = BEDROCK_PATH.fullmatch(path)
+        if path != "/v1/messages" and not bedrock:
+            self.send_error(404)
+            return
+        size = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(size))
+        if bedrock:
+            # Bedrock takes the model and whether to stream from the path
+            body["model"] = unquote(bedrock.group(1))
+            body["stream"] = bedrock.group(2) is not None
+        self.bedrock = bedrock is not None
+        turn, blocks = self.stub.next_turn(self.headers.get(RUN_HEADER, ""), body, size)
+        stop_reason = "tool_use" if any(block["type"] == "tool_use" for block in blocks) else "end_turn"
+        usage = {"input_tokens": size // 4, "output_tokens": len(json.dumps(blocks)) // 4}
+        message = {
+            "id": f"msg_{turn:03d}",
+            "type": "message",
+            "role": "assistant",
+            "model": body["model"],
+            "content": blocks,
+            "stop_reason": stop_reason,
+            "stop_sequence": None,
+            "usage": usage,
+        }
+
+        time.sleep(self.stub.latency)
+        if body.get("stream"):
+            self._send_stream(message)
+        else:
+            time.sleep(self.stub.block_latency * len(blocks))
+            self._send_json(message)
+
+    def _send_json(self, payload: dict[str, Any]) -> None:
+        data = json.dumps(payload).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _send_stream(self, message: dict[str, Any]) -> None:
+        self.send_response(200)
+        self.send_header("Content-Type", "application/vnd.amazon.eventstream" if self.bedrock else "text/event-stream")
+        self.send_header("Connection", "close")
+        self.end_headers()
+        self.close_connection = True
+
+        self._send_event("message_start", {
+            "type": "message_start",
+            "message": {**message, "content": [], "stop_reason": None, "usage": {**message["usage"], "output_tokens": 0}},
+        })
+        for index, block in enumerate(message["content"]):
+            time.sleep(self.stub.block_latency)
+            if block["type"] == "tool_use":
+                start = {**block, "input": {}}
+                delta = {"type": "input_json_delta", "partial_json": json.dumps(block["input"])}
+            else:
+                start = {"type": "text", "text": ""}
+                delta = {"type": "text_delta", "text": block["text"]}
+            self._send_event("content_block_start", {"type": "content_block_start", "index": index, "content_block": start})
+            self._send_event("content_block_delta", {"type": "content_block_delta", "index": index, "delta": delta})
+            self._send_event("content_block_stop", {"type": "content_block_stop", "index": index})
+        self._send_event("message_delta", {
+            "type": "message_delta",
+            "delta": {"stop_reason": message["stop_reason"], "stop_sequence": None},
+            "usage": {"output_tokens": message["usage"]["output_tokens"]},
+        })
+        self._send_event("message_stop", {"type": "message_stop"})
+
+    def _send_event(self, event: str, data: dict[str, Any]) -> None:
+        if self.bedrock:
+            self.wfile.write(_event_stream_chunk(json.dumps(data).encode("utf-8")))
+        else:
+            self.wfile.write(f"event: {event}\ndata: {json.dumps(data)}\n\n".encode("utf-8"))
+        self.wfile.flush()
+
+
+def _event_stream_chunk(payload: bytes) -> bytes:
+    """Encode a Bedrock response stream chunk as an AWS event stream message."""
+    headers = b"".join(
+        bytes([len(name)]) + name.encode("utf-8") + b"\x07" + struct.pack(">H", len(value)) + value.encode("utf-8")
+        for name, value in ((":event-type", "chunk"), (":content-type", "application/json"), (":message-type", "event"))
+    )
+    body = json.dumps({"bytes": base64.b64encode(payload).decode("ascii")}).encode("utf-8")
+    prelude = struct.pack(">II", 12 + len(headers) + len(body) + 4, len(headers))
+    message = prelude + struct.pack(">I", zlib.crc32(prelude)) + headers + body
+    return message + struct.pack(">I", zlib.crc32(message))
@@ -7,7 +7,9 @@ SYSTEM_PROMPT = f"""<SYSTEM_CAPABILITY>
 * You are an automated end-to-end UI test plan generating framework using a with internet access.
 * You will write a test plan based on the provided website and feature to test.
 * Your capabilities include performing actions such as mouse clicks (left and right), dragging, scrolling, text entry, and keyboard hotkey inputs.
-* When using your browser function calls, they take a while to run and send back to you. Where possible/feasible, try to chain multiple of these calls all into one function calls request.
+* The snapshot action returns a text outline of the visible elements with numbered refs. It is much cheaper than a screenshot: prefer it for finding elements and checking text, and click or type by ref instead of coordinates. Take a screenshot when you need to see the visual layout.
+* Clicking, typing, pressing keys, scrolling and navigating report what changed on the page (URL, title, dialogs and elements that appeared, disappeared or changed). Use that to confirm an action worked instead of taking a new screenshot or snapshot.
+* When using your browser function calls, they take a while to run and send back to you. Where possible/feasible, try to chain multiple of these calls all into one function calls request. When you already know a sequence of steps (e.g. filling in every field of a form and submitting it), send them as one batch action; it reports the page changes once at the end and stops at the first step that fails.
 * The current date is {datetime.today().strftime(f'%A, %B {day}, %Y')}.
 </SYSTEM_CAPABILITY>
 
@@ -1,49 +1,120 @@
-import shutil
-import os
+import asyncio
+import time
+import uuid
+from contextlib import nullcontext
+from datetime import datetime
 from pathlib import Path
 
+from dataclasses import dataclass
 from enum import StrEnum
 from typing import Any, cast
 
-from anthropic import Anthropic
+from anthropic import AsyncAnthropic, AsyncAnthropicBedrock
+from playwright.async_api import Browser
 from anthropic.types import (
+    CacheControlEphemeralParam,
     ImageBlockParam,
     Message,
     MessageParam,
     TextBlock,
     TextBlockParam,
     ToolResultBlockParam,
+    ToolUseBlock,
     ToolUseBlockParam,
+    Usage,
 )
 
+from loops.budget import RunBudget, RunStatus, RunUsage
+from loops.history import HistoryManager, count_images
+from loops.providers import ProviderConfig, get_client
+from loops.request_scheduler import RequestScheduler, get_request_scheduler
+from loops.routing import ModelRouter, ModelTiers
+from loops.stuck import StuckDetector
+from util.metrics import increment
+from util.tracing import TRACE_DIR, current_span, since_span_start, span, trace_run
 from config.script_prompt import SYSTEM_PROMPT as SCRIPT_PROMPT
 from config.plan_prompt import SYSTEM_PROMPT as PLAN_PROMPT
-from tools.collection import ToolCollection, ToolResult
+from tools.collection import ToolCollection, ToolResult, ToolScheduler
 from tools.browser import BrowserTool
+from tools.browser_profile import BrowserProfile
+from tools.codegen import ScriptRecorder
+from tools.locator_cache import LocatorCache, get_locator_cache
+from tools.network_archive import HAR_DIR, HarMode, HarUnmatched, NetworkArchive
+from tools.screenshot import ScreenshotConfig
+from tools.trajectory import Trajectory, load_trajectory, save_trajectory
 from tools.script_writer import ScriptWriterTool
 
-class APIProvider(StrEnum):
-    ANTHROPIC = "anthropic"
-    BEDROCK = "bedrock"
-
 class PromptType(StrEnum):
     PLAN = "plan"
     SCRIPT = "script"
 
-PROVIDER_TO_DEFAULT_MODEL_NAME: dict[APIProvider, str] = {
-    APIProvider.ANTHROPIC: "claude-sonnet-4-5-20250929",
-    # APIProvider.BEDROCK: "us.anthropic.claude-sonnet-4-5-20250929-v1:0",
-}
+SCREENSHOT_DIR = Path("../screenshots")
+SUCCESS_INDICATOR = 'success'
+
+# Number of most recent user turns that carry a rolling cache breakpoint. Together with the
+# system prompt and tools breakpoints this stays within the API limit of 4 per request.
+CACHED_USER_TURNS = 2
+
+# Sent to the strong model after a final answer from the fast model, which it has to verify
+VERIFICATION_NOTE = (
+    "This is a verification pass. The final answer above is unverified: check the current page "
+    "to confirm each expected outcome before giving your own final answer. Continue the test if "
+    "anything it claims does not hold."
+)
+
+@dataclass
+class RunResult:
+    """Outcome of a test_gen_loop run."""
+    run_id: str
+    status: RunStatus
+    final_message: str
+    usage: RunUsage
+    turns: int
+    duration: float
+    error: str | None = None
+
+    @property
+    def passed(self) -> bool:
+        return self.status == RunStatus.PASSED
 
-PROVIDER = APIProvider.ANTHROPIC
-MODEL = PROVIDER_TO_DEFAULT_MODEL_NAME[PROVIDER]
+def is_success(final_agent_message: str) -> bool:
+    """Check the last line of the agent's final message for the success indicator."""
+    status = final_agent_message.split('\n')[-1]
+    return SUCCESS_INDICATOR in status.lower()
+
+def new_run_id(prefix: str = "run") -> str:
+    """Create a unique, time-ordered identifier for a run."""
+    return f"{prefix}_{datetime.now().strftime('%Y%m%d_%H%M%S')}_{uuid.uuid4().hex[:6]}"
 
 async def test_gen_loop(
         website_url: str,
         test_case: str,
         prompt_type: PromptType = PromptType.SCRIPT,
-        max_tokens: int = 4096
-) -> str:
+        max_tokens: int = 4096,
+        browser: Browser | None = None,
+        browser_profile: BrowserProfile | None = None,
+        screenshot_dir: Path = SCREENSHOT_DIR,
+        provider: ProviderConfig | None = None,
+        client: AsyncAnthropic | AsyncAnthropicBedrock | None = None,
+        stream: bool = False,
+        prompt_caching: bool = True,
+        history: HistoryManager | None = None,
+        screenshot_config: ScreenshotConfig | None = None,
+        run_id: str | None = None,
+        record_trajectory: bool = True,
+        replay: bool = False,
+        trace_dir: Path | None = TRACE_DIR,
+        chrome_trace: bool = False,
+        budget: RunBudget | None = None,
+        stuck_detector: StuckDetector | None = None,
+        har_mode: HarMode | None = None,
+        har_unmatched: HarUnmatched = HarUnmatched.PASSTHROUGH,
+        har_dir: Path = HAR_DIR,
+        output_dir: Path | None = None,
+        locator_cache: LocatorCache | None = None,
+        request_scheduler: RequestScheduler | None = None,
+        models: ModelTiers | None = None
+) -> RunResult:
     """
     The agent loop that executes the interaction between AI and tool
     
@@ -52,62 +123,372 @@ async def test_gen_loop(
         test_case: The test case instructions
         prompt_type: Either PromptType.PLAN for test plan generation or PromptType.SCRIPT for script generation
         max_tokens: Maximum tokens for API response
+        browser: A shared, already launched browser to run in. The run gets its own
+            BrowserContext on it; when omitted a dedicated browser is launched.
+        browser_profile: Viewport, blocked requests and animations of the run's browser context,
+            and whether a dedicated browser is launched headless
+        screenshot_dir: Directory of the content-addressed screenshot store shared by all runs
+        provider: The API provider and endpoint requests go to. Defaults to the Anthropic API.
+        client: Client used for API requests, or a Cassette recording/replaying responses.
+            Defaults to the client for `provider` shared by all runs on this event loop.
+        stream: Stream responses and start executing each tool_use block as soon as it is complete,
+            while the model is still generating the rest of the turn
+        prompt_caching: Place cache breakpoints on the system prompt, the tool schemas and the
+            most recent turns so each request only processes the new tail of the conversation
+        history: Controls how many screenshots are kept in the history and the token budget
+            old turns are summarized to. Defaults to keeping the 3 most recent screenshots.
+        screenshot_config: Resolution, format and quality screenshots are sent at, and whether
+            they are also saved to disk
+        run_id: Identifies the run in the screenshot store manifests. Generated when omitted.
+        record_trajectory: Record the browser actions of the run and, if it succeeds, save them as
+            the known-good trajectory for this website and test case
+        replay: Re-execute the saved trajectory for this test without the model, falling back to
+            the agent (continuing from the current page) at the first divergence
+        trace_dir: Directory the run's trace (`<run_id>.jsonl`, one line per span) is written to.
+            None disables tracing.
+        chrome_trace: Also export the trace in Chrome trace event format for flamegraph viewers
+        budget: Limits on turns, tokens and wall time after which the run is stopped and the
+            browser closed. Defaults to RunBudget().
+        stuck_detector: Detects repeated actions and unchanged screenshots. The first detections
+            add a corrective note to the tool results, later ones stop the run as stuck.
+            Defaults to StuckDetector().
+        har_mode: Record the run's network traffic to this test's HAR file in `har_dir`, or replay
+            it from there. None uses the network as is.
+        har_unmatched: In replay mode, whether requests missing from the archive (or the whole
+            run, if there is no archive) go to the network or fail
+        har_dir: Directory of the HAR files, one per website and test case
+        output_dir: Directory plans or scripts are written to. Defaults to ../plans or ../scripts.
+        locator_cache: Where the locators of targeted elements are remembered across runs, for
+            generated scripts and replays. Defaults to the cache in ../locators shared by all runs.
+        request_scheduler: Queues the run's API requests fairly with those of other runs, within the
+            rate limits, and retries retryable errors. Defaults to the scheduler shared by all runs
+            on this event loop.
+        models: The fast model for routine turns and the strong model for planning, errors, stuck
+            runs and verifying the final answer. Defaults to the models of `provider`; the same
+            model for both disables routing.
+
+    Returns:
+        The run's status, final message and usage
     """
     messages: list[MessageParam] = [{"role": "user", "content": test_case}]
 
-    _clear_screenshots()
+    run_id = run_id or new_run_id()
+    print(f"[Run ID: {run_id}]")
+
+    trajectory = Trajectory(website_url, test_case, str(prompt_type)) if record_trajectory else None
+    # Scripts are generated from the actions that ran rather than written by the model
+    script_recorder = ScriptRecorder(website_url) if prompt_type == PromptType.SCRIPT else None
 
     # Create the tools
-    browser_tool = BrowserTool(website_url)
-    await browser_tool.start()  # Start it (returns None)
+    browser_tool = BrowserTool(
+        website_url,
+        profile=browser_profile,
+        browser=browser,
+        screenshot_dir=screenshot_dir,
+        screenshot_config=screenshot_config,
+        run_id=run_id,
+        trajectory=trajectory,
+        script_recorder=script_recorder,
+        locator_cache=locator_cache or get_locator_cache(),
+        network_archive=NetworkArchive.for_test(website_url, test_case, har_mode, har_unmatched, har_dir) if har_mode else None
+    )
 
     # Select output directory based on prompt type
-    output_dir = "../plans" if prompt_type == PromptType.PLAN else "../scripts"
-    script_writer = ScriptWriterTool(output_dir=output_dir)
-
-    tool_collection = ToolCollection(browser_tool, script_writer)
+    output_dir = Path(output_dir or ("../plans" if prompt_type == PromptType.PLAN else "../scripts"))
+    if prompt_type == PromptType.PLAN:
+        tool_collection = ToolCollection(browser_tool, ScriptWriterTool(output_dir=output_dir))
+    else:
+        tool_collection = ToolCollection(browser_tool)
     
     # Select the appropriate system prompt based on prompt_type
     system_prompt_text = PLAN_PROMPT if prompt_type == PromptType.PLAN else SCRIPT_PROMPT
     system_prompt = TextBlockParam(type="text", text=system_prompt_text)
+
+    # Tool schemas don't change during a run, so build them once
+    tools = tool_collection.to_params()
+    if prompt_caching:
+        system_prompt["cache_control"] = CacheControlEphemeralParam(type="ephemeral")
+        tools[-1] = {**tools[-1], "cache_control": CacheControlEphemeralParam(type="ephemeral")}
     
     print(f"[Output Directory: {output_dir}]")
     
-    client = Anthropic(
-        api_key=os.getenv("ANTHROPIC_API_KEY")
+    provider = provider or ProviderConfig()
+    client = client or get_client(provider)
+    request_scheduler = request_scheduler or get_request_scheduler()
+    history = history or HistoryManager()
+    budget = budget or RunBudget()
+    stuck_detector = stuck_detector or StuckDetector()
+    router = ModelRouter(models or provider.models)
+    model: str | None = None
+    usage = RunUsage()
+    start = time.monotonic()
+    turn = 0
+    scheduler: ToolScheduler | None = None
+    # Uncached input of the previous request, as the estimate of the next one for the rate limits
+    input_tokens = 0
+
+    def finish(status: RunStatus, final_message: str = '', error: str | None = None) -> RunResult:
+        if status == RunStatus.PASSED and script_recorder is not None:
+            script_path = script_recorder.save(output_dir / f"test_{run_id}.py", description=test_case)
+            print(f"[Script generated from {len(script_recorder.steps)} recorded steps: {script_path}]")
+        return RunResult(
+            run_id=run_id,
+            status=status,
+            final_message=final_message,
+            usage=usage,
+            turns=turn,
+            duration=time.monotonic() - start,
+            error=error,
+        )
+
+    tracing = (
+        trace_run(run_id, trace_dir, chrome_trace, website=website_url, prompt_type=str(prompt_type))
+        if trace_dir is not None else nullcontext()
+    )
+    with tracing as tracer:
+        try:
+            # The wall time limit covers everything up to closing the browser
+            async with asyncio.timeout(budget.max_wall_time) as deadline:
+                with span("browser.start"):
+                    await browser_tool.start()  # Start it (returns None)
+
+                if replay:
+                    recorded = load_trajectory(website_url, test_case)
+                    if recorded and recorded.prompt_type == prompt_type:
+                        with span("replay", steps=len(recorded.steps)) as replay_span:
+                            outcome = await browser_tool.replay(recorded)
+                            replay_span.set(
+                                completed=outcome.completed,
+                                steps_replayed=outcome.steps_replayed,
+                                assertions=outcome.assertions,
+                            )
+                        # The page fingerprint ignores text, so only replayed assertions show the test still passes
+                        if outcome.completed and outcome.assertions:
+                            print(f"[Replayed all {outcome.steps_replayed} recorded steps and {outcome.assertions} assertions held, no model turns needed]")
+                            return finish(RunStatus.PASSED, recorded.final_message)
+                        if outcome.completed:
+                            print(f"[Replayed all {outcome.steps_replayed} recorded steps, but none checks the outcome. Handing over to the agent to verify]")
+                            messages[0]["content"] = _replay_fallback_prompt(test_case, recorded, outcome.steps_replayed)
+                        else:
+                            print(f"[Replay diverged after {outcome.steps_replayed} steps: {outcome.reason}. Falling back to the agent]")
+                            messages[0]["content"] = _replay_fallback_prompt(test_case, recorded, outcome.steps_replayed, outcome.reason)
+                    else:
+                        print("[No recorded trajectory for this test, running the agent]")
+
+                while True:
+                    turn += 1
+                    with span("turn", index=turn):
+                        increment("turns")
+                        previous_model, model = model, router.select()
+                        if model != previous_model:
+                            print(f"[Model: {model}{f' ({router.reason})' if router.reason else ''}]")
+                        with span("history.prune", messages=len(messages)):
+                            history.prune(messages)
+                            if prompt_caching:
+                                _inject_cache_breakpoints(messages)
+                        request_params = dict(
+                            max_tokens=max_tokens,
+                            messages=messages,
+                            model=model,
+                            system=[system_prompt],
+                            tools=tools,
+                        )
+                        scheduler = tool_collection.scheduler()
+
+                        async def send() -> Message:
+                            if stream:
+                                return await _stream_response(client, request_params, scheduler, request_scheduler)
+                            raw_response = await client.messages.with_raw_response.create(**request_params)
+                            request_scheduler.observe(raw_response.headers)
+                            request_span.set(ttfb=since_span_start(request_span))
+                            return await raw_response.parse()
+
+                        try:
+                            with span("api.request", model=model, route=router.reason, stream=stream) as request_span:
+                                # Once a streamed tool use has been submitted the turn can't be sent again
+                                response = await request_scheduler.submit(
+                                    run_id, send, input_tokens, max_tokens, can_retry=lambda: not scheduler.tasks
+                                )
+                                request_span.set(
+                                    stop_reason=response.stop_reason,
+                                    input_tokens=response.usage.input_tokens,
+                                    output_tokens=response.usage.output_tokens,
+                                    cache_read_tokens=response.usage.cache_read_input_tokens,
+                                )
+                        except Exception as e:
+                            print(f"API call failed: {e}")
+                            scheduler.cancel()
+                            return finish(RunStatus.ERROR, error=f"API call failed: {e}")
+
+                        print("******* New instructions received *******\n")
+                        usage.add(response.usage, images=count_images(messages), model=model)
+                        input_tokens = response.usage.input_tokens + (response.usage.cache_creation_input_tokens or 0)
+                        _log_usage(response.usage)
+                        response_params = _response_to_params(response)
+                        messages.append({"role": "assistant", "content": response_params})
+                        # A response cut off at max_tokens can still carry tool uses, which continue the run
+                        continues_run = any(block["type"] == "tool_use" for block in response_params)
+                        if router.needs_verification(model) and not continues_run:
+                            fast_answer = "\n".join(block["text"] for block in response_params if block["type"] == "text")
+                            current_span().set(fast_answer=fast_answer)
+                            # Verifying takes more turns, so it is subject to the budget like continuing the run
+                            exceeded = budget.exceeded(turn, usage)
+                            if exceeded:
+                                print(f"[Budget reached: {exceeded}, accepting the fast model's final answer unverified]")
+                            else:
+                                print(f"[Final answer from the fast model, verifying with the strong model]: {fast_answer}")
+                                router.escalate("final verification")
+                                messages.append({"role": "user", "content": [TextBlockParam(type="text", text=VERIFICATION_NOTE)]})
+                                continue
+
+                        # A final answer is always accepted; only continuing the run is subject to the budget
+                        exceeded = budget.exceeded(turn, usage) if continues_run else None
+                        if exceeded:
+                            print(f"[Budget reached: {exceeded} after {turn} turns, stopping the run]")
+                            scheduler.cancel()
+                            return finish(exceeded, error=f"Run stopped after {turn} turns: {exceeded} budget reached")
+
+                        with span("tools"):
+                            tool_results, final_agent_message = await _process_tool_use(scheduler, response_params)
+
+                        tool_uses = {block["id"]: block for block in response_params if block["type"] == "tool_use"}
+                        for tool_use_id, result in tool_results:
+                            stuck_detector.observe(tool_uses[tool_use_id]["name"], tool_uses[tool_use_id]["input"], result)
+                        router.observe([result for _, result in tool_results])
+                        stuck_pattern = stuck_detector.check() if tool_results else None
+                        if stuck_pattern:
+                            if stuck_detector.should_abort:
+                                print(f"[Stuck: {stuck_pattern}. Stopping the run]")
+                                return finish(RunStatus.STUCK, error=f"Run stopped after {turn} turns: {stuck_pattern}")
+                            print(f"[Stuck: {stuck_pattern}. Adding a corrective note]")
+                            router.escalate("stuck")
+                            tool_use_id, result = tool_results[-1]
+                            note = stuck_detector.note(stuck_pattern)
+                            tool_results[-1] = (tool_use_id, result.replace(
+                                system=f"{result.system}\n{note}" if result.system else note
+                            ))
+
+                        tool_result_content = [
+                            _make_api_tool_result(result, tool_use_id) for tool_use_id, result in tool_results
+                        ]
+                        usage.screenshots += count_images([{"role": "user", "content": tool_result_content}])
+                        if not tool_result_content:
+                            if not is_success(final_agent_message):
+                                return finish(RunStatus.FAILED, final_agent_message)
+                            if trajectory is not None:
+                                trajectory.final_message = final_agent_message
+                                print(f"[Trajectory saved to {save_trajectory(trajectory)}]")
+                            return finish(RunStatus.PASSED, final_agent_message)
+
+                        messages.append({"content": tool_result_content, "role": "user"})
+        except TimeoutError:
+            if not deadline.expired():
+                raise
+            print(f"[Budget reached: wall time of {budget.max_wall_time}s after {turn} turns, stopping the run]")
+            if scheduler is not None:
+                scheduler.cancel()
+            return finish(RunStatus.TIMEOUT, error=f"Run stopped after {budget.max_wall_time}s: wall time budget reached")
+        finally:
+            print(
+                f"[Run usage] requests={usage.requests} input={usage.input_tokens} output={usage.output_tokens} "
+                f"cache_read={usage.cache_read_input_tokens} cache_write={usage.cache_creation_input_tokens} "
+                f"images_sent={usage.images_sent} screenshots={usage.screenshots} models={usage.models}"
+            )
+            print("Closing browser...")
+            with span("browser.close"):
+                await browser_tool.close()
+            print("Browser closed")
+            if tracer is not None:
+                print(f"[Trace written to {tracer.path}]")
+
+
+async def _stream_response(
+        client: AsyncAnthropic | AsyncAnthropicBedrock,
+        request_params: dict[str, Any],
+        scheduler: ToolScheduler,
+        request_scheduler: RequestScheduler
+) -> Message:
+    """
+    Stream a response, submitting each tool_use block to the scheduler as soon as its input is complete.
+
+    Tool execution then overlaps with generation of the later blocks of the turn.
+    Time to first byte and to the first generated token are recorded on the current span, and
+    the rate limit headers are passed to the request scheduler.
+    """
+    request_span = current_span()
+    async with client.messages.stream(**request_params) as response_stream:
+        request_scheduler.observe(response_stream.response.headers)
+        request_span.set(ttfb=since_span_start(request_span))
+        async for event in response_stream:
+            if event.type == "content_block_delta" and "ttft" not in request_span.attributes:
+                request_span.set(ttft=since_span_start(request_span))
+            if event.type == "content_block_stop" and isinstance(event.content_block, ToolUseBlock):
+                block = event.content_block
+                print(f'\n[Tool Use (streamed): {block.name}]')
+                print(f'Input: {block.input}\n')
+                scheduler.submit(block.id, name=block.name, tool_input=block.input)
+        return await response_stream.get_final_message()
+
+
+def _replay_fallback_prompt(
+        test_case: str,
+        trajectory: Trajectory,
+        steps_replayed: int,
+        reason: str | None = None
+) -> str:
+    """
+    Build the initial prompt for an agent taking over from a replay.
+
+    With a `reason` the replay diverged there; without one every step was replayed, but none
+    checked the expected outcome, so the agent has to verify it.
+    """
+    if not steps_replayed:
+        return test_case
+    if reason is None:
+        ending = (
+            "All of them completed, but none of them checked the expected outcome. Verify from the "
+            "current state of the page whether the test passes, completing any steps still missing."
+        )
+    else:
+        ending = f"Replay stopped because the {reason}. Continue the test from the current state of the page."
+    return (
+        f"{test_case}\n\n"
+        f"<replay>The following browser actions from a previous successful run of this test were already "
+        f"performed automatically:\n{trajectory.describe_steps(steps_replayed)}\n{ending}</replay>"
+    )
+
+
+def _inject_cache_breakpoints(messages: list[MessageParam]) -> None:
+    """
+    Move the rolling cache breakpoints onto the last block of the most recent user turns.
+
+    Breakpoints on older turns are removed, so a request never carries more than
+    CACHED_USER_TURNS of them and the cached prefix grows with the conversation.
+    """
+    remaining = CACHED_USER_TURNS
+    for message in reversed(messages):
+        if message["role"] != "user":
+            continue
+        if isinstance(message["content"], str):
+            message["content"] = [TextBlockParam(type="text", text=message["content"])]
+        last_block = message["content"][-1]
+        if remaining:
+            last_block["cache_control"] = CacheControlEphemeralParam(type="ephemeral")
+            remaining -= 1
+        else:
+            last_block.pop("cache_control", None)
+
+
+def _log_usage(usage: Usage) -> None:
+    """Print the token usage of a response, including prompt cache hits and misses."""
+    cache_read = usage.cache_read_input_tokens or 0
+    cache_write = usage.cache_creation_input_tokens or 0
+    print(
+        f"[Usage] input={usage.input_tokens} output={usage.output_tokens} "
+        f"cache_read={cache_read} cache_write={cache_write}"
     )
 
-    try:
-        
-        while True:
-            try:
-                raw_response = client.messages.with_raw_response.create(
-                    max_tokens=max_tokens,
-                    messages=messages,
-                    model=MODEL,
-                    system=[system_prompt],
-                    tools=tool_collection.to_params(),
-                )
-            except Exception as e:
-                print(f"API call failed: {e}")
-                return ""
-
-            response = raw_response.parse()
-            print("******* New instructions received *******\n")
-            response_params = _response_to_params(response)
-            messages.append({"role": "assistant", "content": response_params})
-
-            tool_result_content, final_agent_message = await _process_tool_use(tool_collection, response_params)
-            if not tool_result_content:
-                return final_agent_message
-
-            messages.append({"content": tool_result_content, "role": "user"})
-    finally:
-        print("Closing browser...")
-        await browser_tool.close()
-        print("Browser closed")
 
-    
 def _response_to_params(
         response: Message
 ) -> list[TextBlockParam | ToolUseBlockParam]:
@@ -120,27 +501,34 @@ def _response_to_params(
 
 
 async def _process_tool_use(
-        tool_collection: ToolCollection,
+        scheduler: ToolScheduler,
         response_params: list[TextBlockParam | ToolUseBlockParam]
-) -> tuple[list[ToolResultBlockParam], str]:
-    """Process tool use blocks and text blocks from API response, executing tools and collecting results."""
-    tool_result_content = []
-    final_agent_message = ''
+) -> tuple[list[tuple[str, ToolResult]], str]:
+    """
+    Process tool use blocks and text blocks from API response, executing tools and collecting
+    (tool_use_id, result) pairs.
+
+    Independent tool uses run concurrently; results are returned in the order of the tool use blocks.
+    Tool uses already submitted while streaming are not run again.
+    """
     for block in response_params:
-        if block["type"] == "tool_use":
+        if block["type"] == "tool_use" and block["id"] not in scheduler.tasks:
             print(f'\n[Tool Use: {block["name"]}]')
             print(f'Input: {block["input"]}\n')
-            result = await tool_collection.run(
+            scheduler.submit(
+                block["id"],
                 name=block["name"],
                 tool_input=cast(dict[str, Any], block["input"]),
             )
-            tool_result_content.append(_make_api_tool_result(result, block["id"]))
         elif block["type"] == "text":
             print(f'{block["text"]}\n')
 
-    if not tool_result_content:
+    tool_results = await scheduler.results()
+    final_agent_message = ''
+
+    if not tool_results:
         final_agent_message = response_params[0]['text']
-    return tool_result_content, final_agent_message
+    return tool_results, final_agent_message
 
 def _make_api_tool_result(
     result: ToolResult, tool_use_id: str
@@ -165,7 +553,7 @@ def _make_api_tool_result(
                 "type": "image",
                 "source": {
                     "type": "base64",
-                    "media_type": "image/png",
+                    "media_type": result.image_media_type or "image/png",
                     "data": result.base64_image,
                 }
             })
@@ -183,13 +571,3 @@ def _maybe_prepend_system_tool_result(result: ToolResult, result_text: str) -> s
     if result.system:
         return f"<system>{result.system}</system>\n{result_text}"
     return result_text
-
-def _clear_screenshots():
-    """Clear all PNG screenshot files from the screenshots directory."""
-    screenshot_dir = Path("../screenshots")
-    screenshot_dir.mkdir(parents=True, exist_ok=True)
-    
-    # Remove all .png files
-    png_files = list(screenshot_dir.glob("*.png"))
-    for png_file in png_files:
-        png_file.unlink()
\ No newline at end of file
@@ -0,0 +1,76 @@
+from dataclasses import dataclass, asdict, field
+from enum import StrEnum
+from typing import Any, Optional
+
+from anthropic.types import Usage
+
+
+class RunStatus(StrEnum):
+    PASSED = "passed"
+    FAILED = "failed"
+    ERROR = "error"
+    MAX_TURNS = "max_turns"
+    MAX_TOTAL_TOKENS = "max_total_tokens"
+    TIMEOUT = "timeout"
+    STUCK = "stuck"
+
+
+@dataclass
+class RunUsage:
+    """Resources a run has consumed so far."""
+    requests: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cache_read_input_tokens: int = 0
+    cache_creation_input_tokens: int = 0
+    # Images included in requests, counted once per request they are sent in
+    images_sent: int = 0
+    # New screenshots returned by tools
+    screenshots: int = 0
+    # Requests per model
+    models: dict[str, int] = field(default_factory=dict)
+
+    @property
+    def total_tokens(self) -> int:
+        """All tokens processed: uncached, cached and cache-writing input plus output."""
+        return (
+            self.input_tokens + self.output_tokens
+            + self.cache_read_input_tokens + self.cache_creation_input_tokens
+        )
+
+    def add(self, usage: Usage, images: int = 0, model: Optional[str] = None) -> None:
+        """Add the usage reported for one response from `model`, whose request carried `images` images."""
+        self.requests += 1
+        if model is not None:
+            self.models[model] = self.models.get(model, 0) + 1
+        self.input_tokens += usage.input_tokens
+        self.output_tokens += usage.output_tokens
+        self.cache_read_input_tokens += usage.cache_read_input_tokens or 0
+        self.cache_creation_input_tokens += usage.cache_creation_input_tokens or 0
+        self.images_sent += images
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the usage as a JSON-serializable dict."""
+        return {**asdict(self), "total_tokens": self.total_tokens}
+
+
+@dataclass
+class RunBudget:
+    """
+    Per-run limits. A run that reaches one is stopped cleanly and reports which limit it hit.
+
+    `max_turns` counts model requests, `max_total_tokens` all tokens processed (see
+    `RunUsage.total_tokens`) and `max_wall_time` seconds from the start of the run, including
+    browser startup. Limits set to None are not enforced.
+    """
+    max_turns: Optional[int] = 50
+    max_total_tokens: Optional[int] = 2_000_000
+    max_wall_time: Optional[float] = 30 * 60
+
+    def exceeded(self, turns: int, usage: RunUsage) -> Optional[RunStatus]:
+        """Return the status of a run stopped by the limit it reached after `turns` model turns, or None."""
+        if self.max_turns is not None and turns >= self.max_turns:
+            return RunStatus.MAX_TURNS
+        if self.max_total_tokens is not None and usage.total_tokens >= self.max_total_tokens:
+            return RunStatus.MAX_TOTAL_TOKENS
+        return None
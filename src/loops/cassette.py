@@ -0,0 +1,232 @@
+import asyncio
+import copy
+import hashlib
+import json
+import re
+import time
+from enum import StrEnum
+from pathlib import Path
+from typing import Any, Optional
+
+from anthropic import AsyncAnthropic
+from anthropic.lib.streaming import ParsedContentBlockStopEvent
+from anthropic.types import Message
+
+from loops.providers import ProviderConfig, get_client
+
+CASSETTE_DIR = Path("../cassettes")
+
+# The system prompts embed today's date, which must not change the request key
+DATE_PATTERN = re.compile(r"The current date is .*")
+
+
+class CassetteMode(StrEnum):
+    RECORD = "record"
+    REPLAY = "replay"
+
+
+class CassetteMiss(KeyError):
+    """Raised in replay mode when no recorded response matches a request."""
+
+    def __init__(self, key: str, path: Path):
+        super().__init__(key)
+        self.key = key
+        self.path = path
+
+    def __str__(self) -> str:
+        return f"No recorded response for request {self.key} (expected {self.path})"
+
+
+class Cassette:
+    """
+    Records and replays model responses, standing in for the AsyncAnthropic client.
+
+    Requests are keyed by a hash of their normalized parameters, in which image data is replaced
+    by its hash and cache breakpoints and the date in the system prompt are ignored. In record
+    mode requests are forwarded to the real client and each response is saved as
+    `<directory>/<key>.json`; in replay mode responses are served from disk without any network
+    access, optionally after a simulated latency.
+
+    Supports the parts of the client the agent loop uses: `messages.with_raw_response.create`
+    and `messages.stream`.
+    """
+
+    def __init__(
+            self,
+            directory: Path = CASSETTE_DIR,
+            mode: CassetteMode = CassetteMode.REPLAY,
+            client: AsyncAnthropic | None = None,
+            provider: ProviderConfig | None = None,
+            latency: Optional[float] = None,
+            replay_recorded_latency: bool = False,
+            match_images: bool = True
+    ):
+        """
+        Args:
+            directory: Directory the recorded responses are stored in
+            mode: Whether to record responses from the real client or replay them from disk
+            client: The real client used in record mode. Defaults to the shared client of `provider`.
+            provider: The provider recorded from when no client is given. Defaults to the Anthropic API.
+            latency: Seconds to wait before serving each replayed response
+            replay_recorded_latency: Wait as long as the recorded request took instead of `latency`
+            match_images: Include image content in request keys. Disable to replay against pages
+                that render differently from the recording.
+        """
+        self.directory = Path(directory)
+        self.directory.mkdir(parents=True, exist_ok=True)
+        self.mode = CassetteMode(mode)
+        self.client = client
+        self.provider = provider
+        self.latency = latency
+        self.replay_recorded_latency = replay_recorded_latency
+        self.match_images = match_images
+        self.messages = _CassetteMessages(self)
+
+    @property
+    def real_client(self) -> AsyncAnthropic:
+        """The client requests are forwarded to when recording."""
+        return self.client or get_client(self.provider)
+
+    def request_key(self, params: dict[str, Any]) -> str:
+        """Return the key of a request, a hash of its normalized parameters."""
+        normalized = _normalize(copy.deepcopy(params), self.match_images)
+        return hashlib.sha256(json.dumps(normalized, sort_keys=True).encode('utf-8')).hexdigest()[:32]
+
+    def _path(self, key: str) -> Path:
+        return self.directory / f"{key}.json"
+
+    def save(self, params: dict[str, Any], message: Message, headers: dict[str, str], latency: float) -> None:
+        """Record a response for a request."""
+        entry = {
+            "request": _normalize(copy.deepcopy(params), self.match_images),
+            "response": message.model_dump(mode="json"),
+            "headers": headers,
+            "latency": latency,
+        }
+        with open(self._path(self.request_key(params)), 'w', encoding='utf-8') as file:
+            json.dump(entry, file, indent=2)
+
+    async def load(self, params: dict[str, Any]) -> tuple[Message, dict[str, str]]:
+        """Serve the recorded response for a request, after the simulated latency."""
+        key = self.request_key(params)
+        path = self._path(key)
+        if not path.exists():
+            raise CassetteMiss(key, path)
+        with open(path, 'r', encoding='utf-8') as file:
+            entry = json.load(file)
+
+        latency = entry["latency"] if self.replay_recorded_latency else self.latency
+        if latency:
+            await asyncio.sleep(latency)
+        return Message.model_validate(entry["response"]), entry["headers"]
+
+
+class _CassetteMessages:
+    """Stand-in for `client.messages`."""
+
+    def __init__(self, cassette: Cassette):
+        self._cassette = cassette
+        self.with_raw_response = _CassetteRawMessages(cassette)
+
+    def stream(self, **params: Any) -> "_CassetteStream":
+        return _CassetteStream(self._cassette, params)
+
+
+class _CassetteRawMessages:
+    """Stand-in for `client.messages.with_raw_response`."""
+
+    def __init__(self, cassette: Cassette):
+        self._cassette = cassette
+
+    async def create(self, **params: Any) -> "_CassetteRawResponse":
+        cassette = self._cassette
+        if cassette.mode == CassetteMode.REPLAY:
+            message, headers = await cassette.load(params)
+            return _CassetteRawResponse(message, headers)
+
+        start = time.monotonic()
+        raw_response = await cassette.real_client.messages.with_raw_response.create(**params)
+        message = await raw_response.parse()
+        headers = dict(raw_response.headers)
+        cassette.save(params, message, headers, time.monotonic() - start)
+        return _CassetteRawResponse(message, headers)
+
+
+class _CassetteRawResponse:
+    """Stand-in for the raw API response, exposing the parsed message and headers."""
+
+    def __init__(self, message: Message, headers: dict[str, str]):
+        self._message = message
+        self.headers = headers
+
+    async def parse(self) -> Message:
+        return self._message
+
+
+class _CassetteStream:
+    """
+    Stand-in for the `client.messages.stream` context manager.
+
+    Recording passes the real stream's events through unchanged. Replay emits a content block
+    stop event per recorded block, which is what the agent loop dispatches tools on.
+    """
+
+    def __init__(self, cassette: Cassette, params: dict[str, Any]):
+        self._cassette = cassette
+        self._params = params
+        self._stream_manager = None
+        self._stream = None
+        self._message: Message | None = None
+        self.headers: dict[str, str] = {}
+
+    async def __aenter__(self) -> "_CassetteStream":
+        self._start = time.monotonic()
+        if self._cassette.mode == CassetteMode.REPLAY:
+            self._message, self.headers = await self._cassette.load(self._params)
+        else:
+            self._stream_manager = self._cassette.real_client.messages.stream(**self._params)
+            self._stream = await self._stream_manager.__aenter__()
+            self.headers = dict(self._stream.response.headers)
+        return self
+
+    @property
+    def response(self) -> _CassetteRawResponse:
+        """Stand-in for the stream's HTTP response, exposing its headers."""
+        return _CassetteRawResponse(self._message, self.headers)
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb) -> None:
+        if self._stream_manager is not None:
+            await self._stream_manager.__aexit__(exc_type, exc_val, exc_tb)
+
+    async def __aiter__(self):
+        if self._stream is not None:
+            async for event in self._stream:
+                yield event
+            return
+        for index, block in enumerate(self._message.content):
+            yield ParsedContentBlockStopEvent(
+                type="content_block_stop", index=index, content_block=block.model_dump()
+            )
+
+    async def get_final_message(self) -> Message:
+        if self._stream is not None and self._message is None:
+            self._message = await self._stream.get_final_message()
+            self._cassette.save(self._params, self._message, self.headers, time.monotonic() - self._start)
+        return self._message
+
+
+def _normalize(value: Any, match_images: bool) -> Any:
+    """Strip the parts of request parameters that must not affect its key."""
+    if isinstance(value, dict):
+        value.pop("cache_control", None)
+        if value.get("type") == "image" and isinstance(value.get("source"), dict):
+            data = value["source"].get("data", "")
+            value["source"]["data"] = (
+                "sha256:" + hashlib.sha256(data.encode('utf-8')).hexdigest() if match_images else "<image>"
+            )
+        if value.get("type") == "text" and isinstance(value.get("text"), str):
+            value["text"] = DATE_PATTERN.sub("The current date is <date>.", value["text"])
+        return {key: _normalize(item, match_images) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_normalize(item, match_images) for item in value]
+    return value
@@ -0,0 +1,137 @@
+import json
+from dataclasses import dataclass
+from typing import Any
+
+from anthropic.types import MessageParam
+
+# Rough token estimates used to keep the history under budget
+CHARS_PER_TOKEN = 4
+TOKENS_PER_IMAGE = 1600
+
+IMAGE_PLACEHOLDER = "[Older screenshot removed from history]"
+SUMMARY_MAX_CHARS = 120
+
+
+@dataclass
+class HistoryManager:
+    """
+    Keeps the message history sent on every turn from growing without bound.
+
+    Only the `keep_images` most recent screenshots are kept verbatim; older ones are replaced
+    with a short text placeholder. Images are removed in batches of `min_removal` so the cached
+    prompt prefix is only invalidated every few turns instead of on every turn.
+
+    When `token_budget` is set and the estimated size of the history exceeds it, the oldest
+    turns (never the initial task or the `keep_recent_turns` most recent turns) are summarized:
+    tool results and text are cut to one short line and long tool inputs are elided.
+    """
+    keep_images: int = 3
+    min_removal: int = 2
+    token_budget: int | None = None
+    keep_recent_turns: int = 6
+
+    def prune(self, messages: list[MessageParam]) -> None:
+        """Evict old screenshots and, if over budget, summarize old turns, modifying `messages` in place."""
+        self._evict_images(messages)
+        if self.token_budget is not None:
+            self._summarize_old_turns(messages)
+
+    def _evict_images(self, messages: list[MessageParam]) -> None:
+        """Replace all but the most recent images with a text placeholder."""
+        image_containers = [
+            block["content"]
+            for message in messages
+            if message["role"] == "user" and isinstance(message["content"], list)
+            for block in message["content"]
+            if block.get("type") == "tool_result" and isinstance(block.get("content"), list)
+        ]
+        total_images = sum(
+            1 for content in image_containers for item in content if item.get("type") == "image"
+        )
+        to_remove = total_images - self.keep_images
+        if to_remove < self.min_removal:
+            return
+        # Round down to a whole batch so removals (and cache invalidations) happen in steps
+        to_remove -= to_remove % max(self.min_removal, 1)
+
+        for content in image_containers:
+            for index, item in enumerate(content):
+                if to_remove <= 0:
+                    return
+                if item.get("type") == "image":
+                    content[index] = {"type": "text", "text": IMAGE_PLACEHOLDER}
+                    to_remove -= 1
+
+    def _summarize_old_turns(self, messages: list[MessageParam]) -> None:
+        """Summarize the oldest turns until the history fits the token budget."""
+        # messages[0] is the task itself and is always kept verbatim
+        last_summarizable = len(messages) - 2 * self.keep_recent_turns
+        for message in messages[1:max(last_summarizable, 1)]:
+            if estimate_tokens(messages) <= self.token_budget:
+                return
+            if isinstance(message["content"], list):
+                message["content"] = [_summarize_block(block) for block in message["content"]]
+
+
+def estimate_tokens(messages: list[MessageParam]) -> int:
+    """Roughly estimate the number of input tokens a message history costs."""
+    chars = 0
+    images = 0
+    for message in messages:
+        content = message["content"]
+        if isinstance(content, str):
+            chars += len(content)
+            continue
+        for block in content:
+            if block.get("type") == "tool_result" and isinstance(block.get("content"), list):
+                for item in block["content"]:
+                    if item.get("type") == "image":
+                        images += 1
+                    else:
+                        chars += len(item.get("text", ""))
+            elif block.get("type") == "tool_use":
+                chars += len(json.dumps(block.get("input", {})))
+            else:
+                chars += len(block.get("text", "") or str(block.get("content", "")))
+    return chars // CHARS_PER_TOKEN + images * TOKENS_PER_IMAGE
+
+
+def count_images(messages: list[MessageParam]) -> int:
+    """Count the images in the tool results of a message history."""
+    return sum(
+        1
+        for message in messages
+        if isinstance(message["content"], list)
+        for block in message["content"]
+        if block.get("type") == "tool_result" and isinstance(block.get("content"), list)
+        for item in block["content"]
+        if item.get("type") == "image"
+    )
+
+
+def _summarize_block(block: dict[str, Any]) -> dict[str, Any]:
+    """Return a compact version of a content block that keeps its type and ids."""
+    block_type = block.get("type")
+    if block_type == "text":
+        return {**block, "text": _shorten(block["text"]) or "[summarized]"}
+    if block_type == "tool_use":
+        return {**block, "input": {
+            key: _shorten(value) if isinstance(value, str) else value
+            for key, value in block.get("input", {}).items()
+        }}
+    if block_type == "tool_result":
+        content = block.get("content")
+        if isinstance(content, list):
+            text = " ".join(item.get("text", "") for item in content if item.get("type") == "text")
+        else:
+            text = content or ""
+        return {**block, "content": [{"type": "text", "text": _shorten(text) or "[result summarized]"}]}
+    return block
+
+
+def _shorten(text: str) -> str:
+    """Cut text to a single short line."""
+    line = " ".join(text.split())
+    if len(line) <= SUMMARY_MAX_CHARS:
+        return line
+    return line[:SUMMARY_MAX_CHARS] + "... [summarized]"
@@ -0,0 +1,101 @@
+import asyncio
+import os
+from dataclasses import dataclass
+from enum import StrEnum
+from typing import Any, Optional
+
+from anthropic import AsyncAnthropic, AsyncAnthropicBedrock, DefaultAsyncHttpxClient
+
+from loops.routing import ModelTiers
+from util.tracing import current_span, since_span_start
+
+
+class APIProvider(StrEnum):
+    ANTHROPIC = "anthropic"
+    BEDROCK = "bedrock"
+
+
+# Routine action turns go to the fast model, escalations to the strong one (see ModelRouter)
+PROVIDER_TO_DEFAULT_MODEL_NAME: dict[APIProvider, ModelTiers] = {
+    APIProvider.ANTHROPIC: ModelTiers(fast="claude-haiku-4-5-20251001", strong="claude-sonnet-4-5-20250929"),
+    APIProvider.BEDROCK: ModelTiers(
+        fast="us.anthropic.claude-haiku-4-5-20251001-v1:0",
+        strong="us.anthropic.claude-sonnet-4-5-20250929-v1:0",
+    ),
+}
+
+# One pooled client per event loop and provider, shared by every run (and every turn) on that loop
+_shared_clients: dict[tuple[asyncio.AbstractEventLoop, "ProviderConfig"], AsyncAnthropic | AsyncAnthropicBedrock] = {}
+
+
+@dataclass(frozen=True)
+class ProviderConfig:
+    """
+    Where a run's API requests are sent.
+
+    `base_url` overrides the provider's public endpoint, e.g. with a regional endpoint or a local
+    stub. Anthropic requests authenticate with ANTHROPIC_API_KEY. Bedrock requests use the
+    bearer token in AWS_BEARER_TOKEN_BEDROCK if set, and otherwise SigV4 with the AWS credentials
+    of `aws_profile` (or the environment), which needs boto3. The region defaults to AWS_REGION.
+    """
+    provider: APIProvider = APIProvider.ANTHROPIC
+    base_url: Optional[str] = None
+    aws_region: Optional[str] = None
+    aws_profile: Optional[str] = None
+
+    @property
+    def models(self) -> ModelTiers:
+        return PROVIDER_TO_DEFAULT_MODEL_NAME[self.provider]
+
+
+def create_client(config: ProviderConfig, **options: Any) -> AsyncAnthropic | AsyncAnthropicBedrock:
+    """
+    Create a client for the provider that leaves retries to the RequestScheduler.
+
+    Runs should use `get_client` instead, which shares one client per event loop. `options` are
+    passed to the client, overriding the defaults (e.g. `api_key` or `default_headers`).
+    """
+    options = {
+        "base_url": config.base_url,
+        "http_client": DefaultAsyncHttpxClient(event_hooks={"request": [_mark_request_sent]}),
+        "max_retries": 0,
+        **options,
+    }
+    if config.provider == APIProvider.BEDROCK:
+        return AsyncAnthropicBedrock(aws_region=config.aws_region, aws_profile=config.aws_profile, **options)
+    return AsyncAnthropic(**{"api_key": os.getenv("ANTHROPIC_API_KEY"), **options})
+
+
+def get_client(config: ProviderConfig | None = None) -> AsyncAnthropic | AsyncAnthropicBedrock:
+    """
+    Return the client for a provider shared by all runs on the current event loop.
+
+    The client keeps one connection pool, so concurrent runs and consecutive turns reuse
+    open connections instead of reconnecting for every request. It does not retry on its own:
+    retries go through the RequestScheduler, which spaces them out across all runs.
+    """
+    config = config or ProviderConfig()
+    loop = asyncio.get_running_loop()
+    client = _shared_clients.get((loop, config))
+    if client is None:
+        # Drop clients whose event loop has been closed (e.g. a previous asyncio.run)
+        for stale_key in [key for key in _shared_clients if key[0].is_closed()]:
+            del _shared_clients[stale_key]
+        client = _shared_clients[(loop, config)] = create_client(config)
+    return client
+
+
+async def _mark_request_sent(request: Any) -> None:
+    """
+    Record on the current API request span when the HTTP request is actually sent.
+
+    `queue` is the time between starting the request and sending it, covering waiting for rate
+    limit capacity, request serialization and any retries with their backoff.
+    """
+    request_span = current_span()
+    if request_span is not None and request_span.name == "api.request":
+        request_span.set(
+            queue=since_span_start(request_span),
+            request_bytes=len(request.content),
+            attempts=request_span.attributes.get("attempts", 0) + 1,
+        )
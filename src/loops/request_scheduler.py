@@ -0,0 +1,265 @@
+import asyncio
+import random
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable, Mapping, Optional, TypeVar
+
+from anthropic import APIConnectionError, APIStatusError
+
+from util.metrics import increment
+
+T = TypeVar("T")
+
+# Limits reported in `anthropic-ratelimit-<name>-limit` / `-remaining` response headers
+RATE_LIMITS = ("requests", "input-tokens", "output-tokens")
+
+RETRYABLE_ERROR_TYPES = ("rate_limit_error", "overloaded_error", "api_error")
+
+# One scheduler per event loop, shared by every run on that loop
+_shared_schedulers: dict[asyncio.AbstractEventLoop, "RequestScheduler"] = {}
+
+
+@dataclass
+class _Bucket:
+    """A token bucket refilling to `limit` over a minute. Unlimited until a limit is known."""
+    limit: Optional[float] = None
+    level: float = 0.0
+    updated: float = 0.0
+
+    def refill(self, now: float) -> None:
+        if self.limit is not None:
+            self.level = min(self.limit, self.level + (now - self.updated) * self.limit / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` is available, capped at the limit so large requests can still go."""
+        if self.limit is None:
+            return 0.0
+        return max(0.0, (min(amount, self.limit) - self.level) * 60 / self.limit)
+
+    def take(self, amount: float) -> None:
+        if self.limit is not None:
+            self.level -= min(amount, self.limit)
+
+
+@dataclass
+class _Waiter:
+    """A request waiting for capacity."""
+    amounts: dict[str, float]
+    granted: asyncio.Future = field(repr=False)
+
+
+class RequestScheduler:
+    """
+    Sends the API requests of concurrent runs within the account's rate limits.
+
+    Capacity is tracked in token buckets for requests, input tokens and output tokens per minute,
+    reset from the `anthropic-ratelimit-*` headers of every response (including errors) and
+    refilled continuously in between. Until a response reports a limit it is not enforced.
+    Time is read from the event loop's clock, which its timers and sleeps also follow.
+
+    Runs are served round-robin: each run queues its own requests, and once capacity is available
+    the next run in turn sends its oldest one, so a busy run cannot starve the others. Requests
+    failing with a retryable error (rate limit, overload, server or connection error) are retried
+    after `retry-after` or an exponential backoff with full jitter. A rate limit error also pauses
+    every run for that delay, since they share the limit.
+    """
+
+    def __init__(
+            self,
+            max_retries: int = 6,
+            base_delay: float = 1.0,
+            max_delay: float = 60.0,
+            max_in_flight: Optional[int] = None
+    ):
+        """
+        Args:
+            max_retries: Retries of a request before its error is raised
+            base_delay: Backoff ceiling in seconds for the first retry, doubled for each one after
+            max_delay: Longest backoff, and longest `retry-after` waited for
+            max_in_flight: Maximum number of requests sent at the same time. None for no limit.
+        """
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.max_in_flight = max_in_flight
+        self._buckets = {name: _Bucket() for name in RATE_LIMITS}
+        self._queues: dict[str, deque[_Waiter]] = {}
+        self._turns: deque[str] = deque()  # Runs with queued requests, next to be served first
+        self._in_flight = 0
+        self._paused_until = 0.0
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    async def submit(
+            self,
+            run_id: str,
+            send: Callable[[], Awaitable[T]],
+            input_tokens: int = 0,
+            output_tokens: int = 0,
+            can_retry: Callable[[], bool] = lambda: True
+    ) -> T:
+        """
+        Send a request once it fits the rate limits, retrying retryable errors.
+
+        Args:
+            run_id: The run the request belongs to, which it is queued under
+            send: Sends the request. Called again for each retry.
+            input_tokens: Estimated input tokens counted against the limit
+            output_tokens: Output tokens counted against the limit (the request's max_tokens)
+            can_retry: Whether a failed attempt may still be retried, e.g. not once part of a
+                streamed response has been acted on
+
+        Returns:
+            The result of the successful `send`
+        """
+        amounts = {"requests": 1, "input-tokens": input_tokens, "output-tokens": output_tokens}
+        attempt = 0
+        while True:
+            await self._acquire(run_id, amounts)
+            try:
+                return await send()
+            except Exception as e:
+                response = getattr(e, "response", None)
+                if response is not None:
+                    self.observe(response.headers)
+                if attempt >= self.max_retries or not is_retryable(e) or not can_retry():
+                    raise
+                attempt += 1
+                delay = self._retry_delay(attempt, response)
+                if is_rate_limited(e):
+                    self._paused_until = max(self._paused_until, asyncio.get_running_loop().time() + delay)
+                print(f"[API request failed ({type(e).__name__}: {e}), retry {attempt}/{self.max_retries} in {delay:.1f}s]")
+            finally:
+                self._release()
+            increment("api_retries")
+            await asyncio.sleep(delay)
+
+    def observe(self, headers: Mapping[str, str]) -> None:
+        """Reset the buckets from the rate limit headers of a response."""
+        now = asyncio.get_running_loop().time()
+        for name, bucket in self._buckets.items():
+            try:
+                limit = float(headers[f"anthropic-ratelimit-{name}-limit"])
+                remaining = float(headers[f"anthropic-ratelimit-{name}-remaining"])
+            except (KeyError, ValueError):
+                continue
+            if limit > 0:
+                bucket.limit, bucket.level, bucket.updated = limit, remaining, now
+        self._dispatch()
+
+    async def _acquire(self, run_id: str, amounts: dict[str, float]) -> None:
+        """Queue a request under its run and wait until it is its turn and it fits the limits."""
+        waiter = _Waiter(amounts, asyncio.get_running_loop().create_future())
+        if run_id not in self._queues:
+            self._queues[run_id] = deque()
+            self._turns.append(run_id)
+        self._queues[run_id].append(waiter)
+        self._dispatch()
+        try:
+            await waiter.granted
+        except asyncio.CancelledError:
+            if waiter.granted.cancelled():
+                self._remove(run_id, waiter)
+            else:
+                # Granted just as the run was cancelled
+                self._release()
+            raise
+
+    def _release(self) -> None:
+        self._in_flight -= 1
+        self._dispatch()
+
+    def _remove(self, run_id: str, waiter: _Waiter) -> None:
+        queue = self._queues.get(run_id)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            if not queue:
+                del self._queues[run_id]
+                self._turns.remove(run_id)
+        self._dispatch()
+
+    def _dispatch(self) -> None:
+        """Grant queued requests in turn for as long as they fit, then wait for the next to fit."""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        now = asyncio.get_running_loop().time()
+        for bucket in self._buckets.values():
+            bucket.refill(now)
+
+        while self._turns:
+            if self.max_in_flight is not None and self._in_flight >= self.max_in_flight:
+                return
+            run_id = self._turns[0]
+            waiter = self._queues[run_id][0]
+            wait = max(
+                self._paused_until - now,
+                *(self._buckets[name].wait_time(amount) for name, amount in waiter.amounts.items()),
+            )
+            if wait > 0:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+
+            self._queues[run_id].popleft()
+            self._turns.popleft()
+            if self._queues[run_id]:
+                self._turns.append(run_id)
+            else:
+                del self._queues[run_id]
+            for name, amount in waiter.amounts.items():
+                self._buckets[name].take(amount)
+            self._in_flight += 1
+            waiter.granted.set_result(None)
+
+    def _retry_delay(self, attempt: int, response: Any) -> float:
+        """Return the server's `retry-after`, or a fully jittered exponential backoff."""
+        retry_after = _retry_after(response.headers) if response is not None else None
+        if retry_after is not None and retry_after > 0:
+            return min(retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+
+def get_request_scheduler() -> RequestScheduler:
+    """Return the request scheduler shared by all runs on the current event loop."""
+    loop = asyncio.get_running_loop()
+    scheduler = _shared_schedulers.get(loop)
+    if scheduler is None:
+        for stale_loop in [l for l in _shared_schedulers if l.is_closed()]:
+            del _shared_schedulers[stale_loop]
+        scheduler = _shared_schedulers[loop] = RequestScheduler()
+    return scheduler
+
+
+def is_retryable(error: Exception) -> bool:
+    """Whether a failed request may succeed when sent again, following the API's `x-should-retry`."""
+    if isinstance(error, APIConnectionError):
+        return True
+    if not isinstance(error, APIStatusError):
+        return False
+    should_retry = error.response.headers.get("x-should-retry")
+    if should_retry in ("true", "false"):
+        return should_retry == "true"
+    # Errors inside a stream arrive after a 200 status, so their type is checked too
+    return error.status_code in (408, 409, 429) or error.status_code >= 500 or _error_type(error) in RETRYABLE_ERROR_TYPES
+
+
+def is_rate_limited(error: Exception) -> bool:
+    return isinstance(error, APIStatusError) and (error.status_code == 429 or _error_type(error) == "rate_limit_error")
+
+
+def _error_type(error: APIStatusError) -> Optional[str]:
+    body = error.body
+    if isinstance(body, dict) and isinstance(body.get("error"), dict):
+        return body["error"].get("type")
+    return None
+
+
+def _retry_after(headers: Mapping[str, str]) -> Optional[float]:
+    try:
+        return float(headers["retry-after-ms"]) / 1000
+    except (KeyError, ValueError):
+        pass
+    try:
+        return float(headers["retry-after"])
+    except (KeyError, ValueError):
+        return None
@@ -0,0 +1,58 @@
+from dataclasses import dataclass, field
+from typing import Optional
+
+from tools.base import ToolResult
+
+
+@dataclass(frozen=True)
+class ModelTiers:
+    """The models a provider routes between. Using the same model for both disables routing."""
+    fast: str
+    strong: str
+
+
+@dataclass
+class ModelRouter:
+    """
+    Chooses the model for each turn of a run.
+
+    Routine action turns go to the fast model. The strong model takes the first
+    `strong_first_turns` turns, where the test case is read and planned, and the next
+    `escalation_turns` turns after an escalation: a tool error, a stuck detection, or a final
+    answer from the fast model, which the strong model is asked to verify on the page.
+    The turn after that goes back to the fast model.
+
+    Each model has its own prompt cache, so the first turn on each writes the cache for it.
+    """
+    models: ModelTiers
+    strong_first_turns: int = 1
+    escalation_turns: int = 2
+    reason: Optional[str] = field(default=None, init=False)
+    _strong_turns_left: int = field(default=0, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        if self.strong_first_turns > 0:
+            self.escalate("planning", self.strong_first_turns)
+
+    def select(self) -> str:
+        """Return the model for the next turn, using up one escalated turn."""
+        if self._strong_turns_left > 0:
+            self._strong_turns_left -= 1
+            return self.models.strong
+        self.reason = None
+        return self.models.fast
+
+    def escalate(self, reason: str, turns: Optional[int] = None) -> None:
+        """Send the next turns to the strong model."""
+        self.reason = reason
+        self._strong_turns_left = max(self._strong_turns_left, turns or self.escalation_turns)
+
+    def observe(self, results: list[ToolResult]) -> None:
+        """Escalate after a turn whose tool calls failed."""
+        errors = sum(1 for result in results if result.error)
+        if errors:
+            self.escalate(f"{errors} tool error(s)")
+
+    def needs_verification(self, model: str) -> bool:
+        """Whether a final answer from `model` has to be re-done by the strong model."""
+        return model != self.models.strong
@@ -0,0 +1,89 @@
+import hashlib
+import json
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+from tools.base import ToolResult
+from tools.browser import NO_VISUAL_CHANGE
+
+STUCK_NOTE = (
+    "You appear to be stuck: {pattern}. Repeating it will not change the page. "
+    "Try a different approach, such as another element, scrolling, waiting for the page or "
+    "navigating directly, or finish the test and report the failure."
+)
+
+
+@dataclass
+class StuckDetector:
+    """
+    Detects runs that keep repeating themselves without making progress.
+
+    Every tool call is keyed by its tool, input, outcome and the last screenshot seen before it.
+    The outcome (the result's output, including any change report, or its error) tells apart
+    calls that keep changing the page without screenshots, like scrolling down a feed. The run
+    is stuck when the most recent calls are one call, or a cycle of up to `max_cycle_length`
+    calls, repeated `max_repeats` times with the same outcome, or when `max_identical_frames`
+    screenshots in a row show no change. Screenshots themselves are only judged by their frames,
+    since re-checking a page that is still loading is legitimate.
+
+    Each detection is reported once; the history is cleared so the next one needs fresh
+    repetitions. After `max_warnings` detections the run should be aborted.
+    """
+    max_repeats: int = 3
+    max_cycle_length: int = 3
+    max_identical_frames: int = 3
+    max_warnings: int = 2
+    detections: int = field(default=0, init=False)
+    _calls: list[tuple[str, str, Optional[str], Optional[str]]] = field(default_factory=list, init=False, repr=False)
+    _last_frame: Optional[str] = field(default=None, init=False, repr=False)
+    _identical_frames: int = field(default=0, init=False, repr=False)
+
+    def observe(self, name: str, tool_input: dict[str, Any], result: ToolResult) -> None:
+        """Record a finished tool call."""
+        if result.base64_image:
+            frame = hashlib.sha256(result.base64_image.encode('utf-8')).hexdigest()
+            self._identical_frames = self._identical_frames + 1 if frame == self._last_frame else 0
+            self._last_frame = frame
+        elif result.output == NO_VISUAL_CHANGE:
+            self._identical_frames += 1
+
+        if tool_input.get("action") != "screenshot":
+            outcome = result.output or result.error
+            self._calls.append((name, json.dumps(tool_input, sort_keys=True), self._last_frame, outcome))
+            # Only the tail is ever compared
+            del self._calls[:-self.max_repeats * self.max_cycle_length]
+
+    def check(self) -> Optional[str]:
+        """Return a description of the repetition if the run is stuck, or None."""
+        pattern = self._repeated_frames() or self._repeated_calls()
+        if pattern:
+            self.detections += 1
+            self._calls.clear()
+            self._identical_frames = 0
+        return pattern
+
+    @property
+    def should_abort(self) -> bool:
+        """Whether the run kept repeating itself after being warned."""
+        return self.detections > self.max_warnings
+
+    def note(self, pattern: str) -> str:
+        """The corrective note injected into the next tool result."""
+        return STUCK_NOTE.format(pattern=pattern)
+
+    def _repeated_frames(self) -> Optional[str]:
+        # The first of the frames is the one the others are identical to
+        if self._identical_frames + 1 >= self.max_identical_frames:
+            return f"the last {self._identical_frames + 1} screenshots show no visual change"
+        return None
+
+    def _repeated_calls(self) -> Optional[str]:
+        for length in range(1, self.max_cycle_length + 1):
+            tail = self._calls[-length * self.max_repeats:]
+            if len(tail) < length * self.max_repeats:
+                break
+            cycle = tail[:length]
+            if tail == cycle * self.max_repeats:
+                calls = ", then ".join(f"{name} {tool_input}" for name, tool_input, _, _ in cycle)
+                return f"the same {'call' if length == 1 else 'calls'} ({calls}) repeated {self.max_repeats} times"
+        return None
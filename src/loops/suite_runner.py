@@ -0,0 +1,124 @@
+import asyncio
+import time
+from dataclasses import dataclass, asdict, field
+from typing import Any, Optional
+
+from playwright.async_api import async_playwright, Browser
+
+from loops.agent_loop import test_gen_loop, new_run_id, PromptType
+from loops.budget import RunStatus
+from tools.browser_profile import BrowserProfile, PROFILES
+
+
+@dataclass
+class TestCaseResult:
+    """Outcome of a single test case run by the suite runner."""
+    name: str
+    run_id: str
+    website: str
+    prompt_type: str
+    passed: bool
+    status: str
+    final_message: str
+    duration: float
+    turns: int = 0
+    usage: dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+
+    def to_dict(self) -> dict[str, Any]:
+        """Return the result as a JSON-serializable dict."""
+        return asdict(self)
+
+
+async def run_test_suite(
+        test_cases: list[dict[str, Any]],
+        concurrency: int = 4,
+        prompt_type: PromptType = PromptType.SCRIPT,
+        headless: bool = False,
+        profile: BrowserProfile | None = None,
+        **loop_options: Any
+) -> list[TestCaseResult]:
+    """
+    Run test cases concurrently on one event loop, sharing a single Chromium process.
+
+    Each test case runs in its own BrowserContext off the shared browser, with at most
+    `concurrency` test cases in flight at a time.
+
+    Args:
+        test_cases: Test case dicts with 'name', 'website', 'instructions' and optionally 'prompt_type'
+            and 'profile' (the name of a browser profile in PROFILES)
+        concurrency: Maximum number of test cases run at the same time
+        prompt_type: Prompt type used for test cases that don't specify their own
+        headless: Whether to launch the shared browser headless
+        profile: Browser profile for test cases that don't name their own
+        **loop_options: Extra keyword arguments passed to every test_gen_loop call (e.g. stream=True)
+
+    Returns:
+        One result per test case, in the order the test cases were given
+    """
+    if concurrency < 1:
+        raise ValueError("concurrency must be at least 1")
+    for test in test_cases:
+        if test.get('profile') and test['profile'] not in PROFILES:
+            raise ValueError(f"Test case {test['name']} has an unknown browser profile: {test['profile']}")
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async with async_playwright() as playwright:
+        browser = await playwright.chromium.launch(headless=headless)
+        try:
+            return await asyncio.gather(*(
+                _run_test_case(browser, semaphore, test, prompt_type, profile, loop_options)
+                for test in test_cases
+            ))
+        finally:
+            await browser.close()
+
+
+async def _run_test_case(
+        browser: Browser,
+        semaphore: asyncio.Semaphore,
+        test: dict[str, Any],
+        default_prompt_type: PromptType,
+        default_profile: BrowserProfile | None,
+        loop_options: dict[str, Any]
+) -> TestCaseResult:
+    """Run a single test case once a concurrency slot is free, capturing any failure as a result."""
+    prompt_type = PromptType(test.get('prompt_type', default_prompt_type))
+    profile = PROFILES[test['profile']] if test.get('profile') else default_profile
+    run_id = new_run_id(test['name'])
+
+    async with semaphore:
+        print(f"[Starting test: {test['name']}]")
+        start = time.monotonic()
+        result = None
+        error = None
+        try:
+            result = await test_gen_loop(
+                test['website'],
+                test['instructions'],
+                prompt_type=prompt_type,
+                browser=browser,
+                browser_profile=profile,
+                run_id=run_id,
+                **loop_options,
+            )
+            error = result.error
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            print(f"[Test {test['name']} errored: {error}]")
+        duration = time.monotonic() - start
+
+    return TestCaseResult(
+        name=test['name'],
+        run_id=run_id,
+        website=test['website'],
+        prompt_type=str(prompt_type),
+        passed=result is not None and result.passed,
+        status=str(result.status if result else RunStatus.ERROR),
+        final_message=result.final_message if result else '',
+        duration=duration,
+        turns=result.turns if result else 0,
+        usage=result.usage.to_dict() if result else {},
+        error=error,
+    )
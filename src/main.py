@@ -1,11 +1,20 @@
+import argparse
 import asyncio
+import json
+from dataclasses import replace
 
 from loops.agent_loop import test_gen_loop, PromptType
-from util.read_test_file import read_test_file
+from loops.budget import RunBudget
+from loops.cassette import Cassette, CassetteMode
+from loops.providers import APIProvider, ProviderConfig
+from loops.routing import ModelTiers
+from loops.suite_runner import run_test_suite
+from tools.browser_profile import PROFILES
+from tools.network_archive import HarMode, HarUnmatched
+from util.read_test_file import read_test_file, read_test_cases
 
 PLAN_FILE_PATH = '../plan.txt'
 TEST_FILE_PATH = '../test.txt'
-SUCCESS_INDICATOR = 'success'
 
 def display_menu():
     """Display menu and get user selection"""
@@ -22,8 +31,160 @@ def display_menu():
             return choice
         print("Invalid selection. Please enter 1 or 2.")
 
+def parse_args():
+    """Parse command line arguments for non-interactive suite runs."""
+    parser = argparse.ArgumentParser(description="AI-powered web testing agent")
+    parser.add_argument(
+        "--suite",
+        help="Directory of test files or JSONL file of test cases to run without the menu",
+    )
+    parser.add_argument(
+        "--concurrency", type=int, default=4,
+        help="Maximum number of test cases run at the same time (default: 4)",
+    )
+    parser.add_argument(
+        "--mode", choices=[p.value for p in PromptType], default=PromptType.SCRIPT.value,
+        help="Prompt type for test cases that don't specify one (default: script)",
+    )
+    parser.add_argument("--headless", action="store_true", help="Run the browser headless")
+    parser.add_argument(
+        "--profile", choices=list(PROFILES), default="default",
+        help="Browser profile for tests that don't name one; 'fast' runs headless at 1280x800 "
+             "without media, fonts, trackers or animations (default: default)",
+    )
+    parser.add_argument("--results", help="Write per-test results to this JSON file")
+    parser.add_argument(
+        "--stream", action="store_true",
+        help="Stream model responses and start tools while the rest of the turn is generated",
+    )
+    parser.add_argument(
+        "--replay", action="store_true",
+        help="Replay the recorded trajectory of previously passing tests before falling back to the agent",
+    )
+    parser.add_argument(
+        "--cassette",
+        help="Directory of recorded model responses to record to or replay from",
+    )
+    parser.add_argument(
+        "--cassette-mode", choices=[m.value for m in CassetteMode], default=CassetteMode.REPLAY.value,
+        help="Record responses from the API or replay them offline (default: replay)",
+    )
+    parser.add_argument(
+        "--cassette-latency", type=float,
+        help="Seconds of simulated latency per replayed response",
+    )
+    parser.add_argument(
+        "--har-mode", choices=[m.value for m in HarMode],
+        help="Record each test's network traffic to a HAR file, or serve requests from it",
+    )
+    parser.add_argument(
+        "--har-unmatched", choices=[u.value for u in HarUnmatched], default=HarUnmatched.PASSTHROUGH.value,
+        help="When replaying, send requests missing from the HAR file to the network or fail them (default: passthrough)",
+    )
+    parser.add_argument("--max-turns", type=int, default=RunBudget.max_turns, help="Stop a test after this many model turns")
+    parser.add_argument(
+        "--max-total-tokens", type=int, default=RunBudget.max_total_tokens,
+        help="Stop a test once it has processed this many tokens",
+    )
+    parser.add_argument(
+        "--max-wall-time", type=float, default=RunBudget.max_wall_time,
+        help="Stop a test after this many seconds",
+    )
+    parser.add_argument(
+        "--chrome-trace", action="store_true",
+        help="Also export each run's trace in Chrome trace event format for flamegraph viewers",
+    )
+    parser.add_argument(
+        "--no-model-routing", action="store_true",
+        help="Send every turn to the strong model instead of routine turns to the fast model",
+    )
+    parser.add_argument(
+        "--provider", choices=[p.value for p in APIProvider], default=APIProvider.ANTHROPIC.value,
+        help="API provider the model requests go to (default: anthropic)",
+    )
+    parser.add_argument(
+        "--base-url",
+        help="Endpoint to send model requests to instead of the provider's public one, e.g. a regional endpoint",
+    )
+    parser.add_argument("--aws-region", help="AWS region of the Bedrock endpoint (default: AWS_REGION)")
+    args = parser.parse_args()
+    if args.results and not args.suite:
+        parser.error("--results needs --suite")
+    return args
+
+def selected_provider(args):
+    """Return the provider and endpoint selected on the command line."""
+    return ProviderConfig(APIProvider(args.provider), base_url=args.base_url, aws_region=args.aws_region)
+
+def selected_models(args):
+    """Return the provider's models to route between, or only the strong one when routing is off."""
+    models = selected_provider(args).models
+    return ModelTiers(models.strong, models.strong) if args.no_model_routing else models
+
+def menu_profile(args):
+    """Return the browser profile of a menu run, which `--headless` also applies to."""
+    profile = PROFILES[args.profile]
+    return replace(profile, headless=True) if args.headless else profile
+
+def loop_options(args):
+    """Return the test_gen_loop options set on the command line, shared by suite and menu runs."""
+    options = dict(
+        stream=args.stream,
+        replay=args.replay,
+        chrome_trace=args.chrome_trace,
+        provider=selected_provider(args),
+        models=selected_models(args),
+        har_mode=HarMode(args.har_mode) if args.har_mode else None,
+        har_unmatched=HarUnmatched(args.har_unmatched),
+        budget=RunBudget(args.max_turns, args.max_total_tokens, args.max_wall_time),
+    )
+    if args.cassette:
+        options['client'] = Cassette(
+            args.cassette,
+            mode=CassetteMode(args.cassette_mode),
+            latency=args.cassette_latency,
+            provider=selected_provider(args)
+        )
+    return options
+
+def run_suite(args):
+    """Run a suite of test cases concurrently and report per-test results."""
+    test_cases = read_test_cases(args.suite)
+    print(f"\n[Running {len(test_cases)} test(s) with concurrency {args.concurrency}...]")
+
+    results = asyncio.run(run_test_suite(
+        test_cases,
+        concurrency=args.concurrency,
+        prompt_type=PromptType(args.mode),
+        headless=args.headless or PROFILES[args.profile].headless,
+        profile=PROFILES[args.profile],
+        **loop_options(args)
+    ))
+
+    print("\n" + "="*50)
+    for result in results:
+        if result.passed:
+            print(f"\033[32mPASS\033[0m {result.name} ({result.duration:.1f}s)")
+        else:
+            reason = f" - {result.error}" if result.error else ""
+            print(f"\033[31mFAIL\033[0m {result.name} ({result.duration:.1f}s, {result.status}){reason}")
+    passed = sum(result.passed for result in results)
+    print("="*50)
+    print(f"{passed}/{len(results)} passed")
+
+    if args.results:
+        with open(args.results, 'w', encoding='utf-8') as file:
+            json.dump([result.to_dict() for result in results], file, indent=2)
+        print(f"Results written to {args.results}")
+
+    return 0 if passed == len(results) else 1
+
 def main():
-    """Entry point for the test agent. Displays menu and runs selected test mode."""
+    """Entry point for the test agent. Runs a suite when given, otherwise displays the menu."""
+    args = parse_args()
+    if args.suite:
+        raise SystemExit(run_suite(args))
+
     choice = display_menu()
     
     if choice == '1':
@@ -31,34 +192,36 @@ def main():
         
         test = read_test_file(PLAN_FILE_PATH)
         
-        final_agent_message = asyncio.run(test_gen_loop(
+        result = asyncio.run(test_gen_loop(
             test['website'], 
             test['instructions'],
-            prompt_type=PromptType.PLAN
+            prompt_type=PromptType.PLAN,
+            browser_profile=menu_profile(args),
+            **loop_options(args)
         ))
-        status = final_agent_message.split('\n')[-1]
 
-        if SUCCESS_INDICATOR in status.lower():
+        if result.passed:
             print("\033[32mTest Plan Generation Passed\033[0m")
         else:
-            print("\033[31mTest Plan Generation Failed\033[0m")
+            print(f"\033[31mTest Plan Generation Failed ({result.status})\033[0m")
             
     elif choice == '2':
         print("\n[Generating Test Script...]")
 
         test = read_test_file(TEST_FILE_PATH)
 
-        final_agent_message = asyncio.run(test_gen_loop(
+        result = asyncio.run(test_gen_loop(
             test['website'], 
             test['instructions'],
-            prompt_type=PromptType.SCRIPT
+            prompt_type=PromptType.SCRIPT,
+            browser_profile=menu_profile(args),
+            **loop_options(args)
         ))
-        status = final_agent_message.split('\n')[-1]
 
-        if SUCCESS_INDICATOR in status.lower():
+        if result.passed:
             print("\033[32mTest Passed\033[0m")
         else:
-            print("\033[31mTest Failed\033[0m")
+            print(f"\033[31mTest Failed ({result.status})\033[0m")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,41 @@
+import asyncio
+import selectors
+
+import pytest
+
+
+class _InstantSelector(selectors.DefaultSelector):
+    """Moves the loop's clock forward by the time it would wait for a timer, instead of waiting."""
+
+    def __init__(self, loop: "VirtualClockLoop"):
+        super().__init__()
+        self._loop = loop
+
+    def select(self, timeout=None):
+        if timeout is not None:
+            self._loop.now += timeout
+            timeout = 0
+        return super().select(timeout)
+
+
+class VirtualClockLoop(asyncio.SelectorEventLoop):
+    """
+    An event loop on a fake clock starting at 0.
+
+    The clock only moves when the loop has nothing to run but timers, jumping to the next one, so
+    sleeps, timeouts and backoffs finish at once while `time()` reports how long they took.
+    """
+
+    def __init__(self):
+        self.now = 0.0
+        super().__init__(_InstantSelector(self))
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def loop():
+    loop = VirtualClockLoop()
+    yield loop
+    loop.close()
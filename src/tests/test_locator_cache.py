@@ -0,0 +1,111 @@
+import asyncio
+
+from tools.locator_cache import LocatorCache, element_key
+
+URL = "https://example.com/signup?step=1"
+
+TEST_ID = {"kind": "test_id", "value": "submit"}
+ROLE = {"kind": "role", "role": "button", "name": "Sign up", "exact": True}
+CSS = {"kind": "css", "value": "form > button"}
+
+
+def target(*candidates, role="button", name="Sign up", text="Sign up"):
+    return {"candidates": list(candidates), "role": role, "name": name, "text": text}
+
+
+class FakeLocator:
+    def __init__(self, matches: int):
+        self.matches = matches
+
+    async def count(self) -> int:
+        return self.matches
+
+
+class FakePage:
+    """Finds the number of elements given for each locator, and none for the others."""
+
+    def __init__(self, url: str, matches: dict[tuple[str, str], int]):
+        self.url = url
+        self.matches = matches
+
+    def _locator(self, kind: str, value: str) -> FakeLocator:
+        return FakeLocator(self.matches.get((kind, value), 0))
+
+    def get_by_test_id(self, value):
+        return self._locator("test_id", value)
+
+    def get_by_role(self, role, name, exact):
+        return self._locator("role", name)
+
+    def get_by_placeholder(self, value, exact):
+        return self._locator("placeholder", value)
+
+    def get_by_text(self, value, exact):
+        return self._locator("text", value)
+
+    def locator(self, value):
+        return self._locator("css", value)
+
+
+def test_element_key():
+    assert element_key(URL, target(CSS)) == "/signup button Sign up"
+    assert element_key(URL, target(CSS, role=None, name="")) == "/signup text Sign up"
+    assert element_key("https://example.com", target(CSS, role=None, name="", text="")) == "/ css form > button"
+
+
+def test_element_key_ignores_names_taken_from_the_value():
+    field = {"kind": "css", "value": "form > input:nth-of-type(2)"}
+    typed = target(field, role="textbox", name="hunter2", text="") | {"value": "hunter2"}
+    assert element_key(URL, typed) == "/signup css form > input:nth-of-type(2)"
+    long = "a" * 100
+    typed = target(field, role="textbox", name=long[:80] + "...", text="") | {"value": long}
+    assert element_key(URL, typed) == "/signup css form > input:nth-of-type(2)"
+    labelled = target(field, role="textbox", name="Password", text="") | {"value": "hunter2"}
+    assert element_key(URL, labelled) == "/signup textbox Password"
+
+
+def test_candidates_seen_most_come_first(tmp_path):
+    cache = LocatorCache(tmp_path)
+    cache.remember(URL, target(TEST_ID, CSS))
+    remembered = cache.remember(URL, target(ROLE, CSS))
+
+    # The test id was not unique the second time, so it was dropped
+    assert remembered["candidates"] == [CSS, ROLE]
+    assert cache.candidates(URL, "/signup button Sign up") == [CSS, ROLE]
+
+
+def test_invalidate_drops_the_candidate_then_the_element(tmp_path):
+    cache = LocatorCache(tmp_path)
+    cache.remember(URL, target(ROLE, CSS))
+    key = element_key(URL, target(ROLE, CSS))
+
+    cache.invalidate(URL, key, ROLE)
+    assert cache.candidates(URL, key) == [CSS]
+    cache.invalidate(URL, key, CSS)
+    assert cache.candidates(URL, key) == []
+
+
+def test_entries_are_saved_per_origin(tmp_path):
+    cache = LocatorCache(tmp_path)
+    cache.remember(URL, target(ROLE, CSS))
+    cache.remember("https://other.example.com/", target(CSS))
+    cache.save()
+
+    assert sorted(path.name for path in tmp_path.iterdir()) == [
+        "https_example.com.json",
+        "https_other.example.com.json",
+    ]
+    reloaded = LocatorCache(tmp_path)
+    assert reloaded.candidates("https://example.com/signup", "/signup button Sign up") == [ROLE, CSS]
+
+
+def test_locate_skips_and_invalidates_candidates_that_are_not_unique(tmp_path):
+    cache = LocatorCache(tmp_path)
+    cache.remember(URL, target(TEST_ID, ROLE, CSS))
+    key = element_key(URL, target(CSS))
+    # The test id is gone and the role matches two buttons now
+    page = FakePage(URL, {("role", "Sign up"): 2, ("css", "form > button"): 1})
+
+    locator = asyncio.run(cache.locate(page, key))
+    assert locator.matches == 1
+    assert cache.candidates(URL, key) == [CSS]
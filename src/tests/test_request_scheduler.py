@@ -0,0 +1,175 @@
+import asyncio
+
+import httpx2
+import pytest
+from anthropic import RateLimitError
+
+from loops.request_scheduler import RequestScheduler
+
+
+def rate_limit_error(retry_after: float) -> RateLimitError:
+    request = httpx2.Request("POST", "https://api.anthropic.com/v1/messages")
+    response = httpx2.Response(429, headers={"retry-after": str(retry_after)}, request=request)
+    body = {"type": "error", "error": {"type": "rate_limit_error", "message": "Rate limited"}}
+    return RateLimitError("Rate limited", response=response, body=body)
+
+
+async def sent() -> str:
+    return "sent"
+
+
+def test_runs_are_served_round_robin(loop):
+    scheduler = RequestScheduler(max_in_flight=1)
+    order = []
+
+    async def request(run_id: str, index: int) -> None:
+        async def send():
+            order.append((run_id, index))
+            await asyncio.sleep(1)
+        await scheduler.submit(run_id, send)
+
+    async def main():
+        await asyncio.gather(*(request("a", index) for index in range(3)), request("b", 0))
+
+    loop.run_until_complete(main())
+    # "b" queued behind two requests of "a" is served after one of them, not both
+    assert order == [("a", 0), ("a", 1), ("b", 0), ("a", 2)]
+    assert loop.time() == pytest.approx(4)
+
+
+def test_limits_are_not_enforced_until_reported(loop):
+    scheduler = RequestScheduler()
+
+    async def main():
+        for _ in range(10):
+            await scheduler.submit("a", sent, input_tokens=100_000, output_tokens=10_000)
+
+    loop.run_until_complete(main())
+    assert loop.time() == 0
+
+
+def test_requests_wait_for_the_token_bucket_to_refill(loop):
+    scheduler = RequestScheduler()
+    sent_at = []
+
+    async def send():
+        sent_at.append(loop.time())
+
+    async def main():
+        # 600 input tokens per minute refill 10 per second
+        scheduler.observe({
+            "anthropic-ratelimit-input-tokens-limit": "600",
+            "anthropic-ratelimit-input-tokens-remaining": "0",
+        })
+        await scheduler.submit("a", send, input_tokens=300)
+        await scheduler.submit("a", send, input_tokens=300)
+        # Larger than the limit: waits for a full bucket rather than forever
+        await scheduler.submit("a", send, input_tokens=6000)
+
+    loop.run_until_complete(main())
+    assert sent_at == [pytest.approx(30), pytest.approx(60), pytest.approx(120)]
+
+
+def test_cancelled_request_leaves_the_queue(loop):
+    scheduler = RequestScheduler(max_in_flight=1)
+
+    async def main():
+        release = asyncio.Event()
+
+        async def hold():
+            await release.wait()
+
+        holder = asyncio.create_task(scheduler.submit("a", hold))
+        queued = asyncio.create_task(scheduler.submit("b", sent))
+        await asyncio.sleep(0)
+        assert list(scheduler._turns) == ["b"]
+
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        assert not scheduler._turns and not scheduler._queues
+
+        release.set()
+        await holder
+        assert scheduler._in_flight == 0
+        assert await scheduler.submit("c", sent) == "sent"
+
+    loop.run_until_complete(main())
+
+
+def test_request_cancelled_after_its_grant_releases_it(loop):
+    scheduler = RequestScheduler(max_in_flight=1)
+    calls = []
+
+    async def send():
+        calls.append("b")
+
+    async def main():
+        await scheduler._acquire("a", {"requests": 1})
+        queued = asyncio.create_task(scheduler.submit("b", send))
+        await asyncio.sleep(0)
+
+        # Grants "b", which is cancelled before it gets to run
+        scheduler._release()
+        assert scheduler._in_flight == 1
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+
+        assert scheduler._in_flight == 0
+        assert await scheduler.submit("c", sent) == "sent"
+
+    loop.run_until_complete(main())
+    assert calls == []
+
+
+def test_rate_limit_error_is_retried_and_pauses_every_run(loop):
+    scheduler = RequestScheduler()
+    attempts = []
+    other_sent_at = []
+
+    async def limited():
+        attempts.append(loop.time())
+        if len(attempts) == 1:
+            raise rate_limit_error(retry_after=5)
+        return "sent"
+
+    async def other():
+        other_sent_at.append(loop.time())
+
+    async def main():
+        retried = asyncio.create_task(scheduler.submit("a", limited))
+        await asyncio.sleep(1)
+        await scheduler.submit("b", other)
+        assert await retried == "sent"
+
+    loop.run_until_complete(main())
+    assert attempts == [0, pytest.approx(5)]
+    assert other_sent_at == [pytest.approx(5)]
+
+
+def test_retries_stop_at_max_retries(loop):
+    scheduler = RequestScheduler(max_retries=2)
+    attempts = []
+
+    async def limited():
+        attempts.append(loop.time())
+        raise rate_limit_error(retry_after=1)
+
+    with pytest.raises(RateLimitError):
+        loop.run_until_complete(scheduler.submit("a", limited))
+    assert attempts == [0, pytest.approx(1), pytest.approx(2)]
+
+
+def test_no_retry_once_the_request_cannot_be_retried(loop):
+    scheduler = RequestScheduler()
+    attempts = []
+
+    async def limited():
+        attempts.append(loop.time())
+        raise rate_limit_error(retry_after=1)
+
+    with pytest.raises(RateLimitError):
+        loop.run_until_complete(scheduler.submit("a", limited, can_retry=lambda: False))
+    assert attempts == [0]
+    assert scheduler._in_flight == 0
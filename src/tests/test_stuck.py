@@ -0,0 +1,70 @@
+from loops.stuck import StuckDetector
+from tools.base import ToolResult
+from tools.browser import NO_VISUAL_CHANGE
+
+CLICK = {"action": "click", "x": 100, "y": 200}
+SCROLL = {"action": "scroll", "x": 0, "y": 500}
+TAB = {"action": "key", "text": "tab"}
+
+
+def test_repeated_call_with_the_same_outcome_is_stuck():
+    detector = StuckDetector()
+    for _ in range(2):
+        detector.observe("browser", CLICK, ToolResult(output="Clicked\nPage changes: none visible."))
+        assert detector.check() is None
+    detector.observe("browser", CLICK, ToolResult(output="Clicked\nPage changes: none visible."))
+    assert "repeated 3 times" in detector.check()
+
+
+def test_repeated_call_that_keeps_changing_the_page_is_not_stuck():
+    detector = StuckDetector()
+    for position in range(1, 6):
+        detector.observe("browser", SCROLL, ToolResult(output=f"Scrolled\nPage changes:\nScrolled to {500 * position} of 5000"))
+        detector.observe("browser", TAB, ToolResult(output=f"Pressed\nPage changes:\n~ link \"{position}\" [ref={position}]: focused None -> True"))
+        assert detector.check() is None
+
+
+def test_repeated_cycle_is_stuck():
+    detector = StuckDetector()
+    for _ in range(3):
+        assert detector.check() is None
+        detector.observe("browser", CLICK, ToolResult(output="Clicked"))
+        detector.observe("browser", SCROLL, ToolResult(output="Scrolled"))
+    assert "then" in detector.check()
+
+
+def test_repeated_errors_are_stuck():
+    detector = StuckDetector()
+    for _ in range(3):
+        detector.observe("browser", {"action": "type", "ref": 4, "text": "a"}, ToolResult(error="No element with ref 4"))
+    assert detector.check() is not None
+
+
+def test_calls_after_a_new_screenshot_start_over():
+    detector = StuckDetector()
+    detector.observe("browser", CLICK, ToolResult(output="Clicked"))
+    detector.observe("browser", CLICK, ToolResult(output="Clicked"))
+    detector.observe("browser", {"action": "screenshot"}, ToolResult(base64_image="frame"))
+    detector.observe("browser", CLICK, ToolResult(output="Clicked"))
+    assert detector.check() is None
+
+
+def test_unchanged_screenshots_are_stuck():
+    detector = StuckDetector()
+    detector.observe("browser", {"action": "screenshot"}, ToolResult(base64_image="frame"))
+    detector.observe("browser", {"action": "screenshot"}, ToolResult(output=NO_VISUAL_CHANGE))
+    assert detector.check() is None
+    detector.observe("browser", {"action": "screenshot"}, ToolResult(base64_image="frame"))
+    assert "no visual change" in detector.check()
+
+
+def test_abort_after_the_warnings():
+    detector = StuckDetector(max_warnings=1)
+    for _ in range(2):
+        assert not detector.should_abort
+        for _ in range(3):
+            detector.observe("browser", CLICK, ToolResult(output="Clicked"))
+        # Each detection clears the history, so it is reported once
+        assert detector.check() is not None
+        assert detector.check() is None
+    assert detector.should_abort
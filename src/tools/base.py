@@ -18,6 +18,15 @@ class BaseAnthropicTool(metaclass=ABCMeta):
         """Returns the tool's parameters in the BetaToolUnionParam format."""
         raise NotImplementedError
 
+    def resource_access(self, tool_input: dict[str, Any]) -> tuple[str, bool]:
+        """
+        Returns the resource a call with this input touches and whether it only reads it.
+
+        Used to schedule calls within a turn: calls on different resources, or reads of the same
+        resource, may run concurrently. By default every call of a tool mutates one shared resource.
+        """
+        return self.name, False
+
 
 @dataclass(kw_only=True, frozen=True)
 class ToolResult:
@@ -25,6 +34,7 @@ class ToolResult:
     output: Optional[str] = None
     error: Optional[str] = None
     base64_image: Optional[str] = None
+    image_media_type: Optional[str] = None
     system: Optional[str] = None
 
     def __bool__(self) -> bool:
@@ -44,6 +54,7 @@ class ToolResult:
             output=combine_fields(self.output, other.output),
             error=combine_fields(self.error, other.error),
             base64_image=combine_fields(self.base64_image, other.base64_image, False),
+            image_media_type=combine_fields(self.image_media_type, other.image_media_type, False),
             system=combine_fields(self.system, other.system)
         )
 
@@ -1,14 +1,51 @@
 from typing import Any
-from playwright.async_api import async_playwright, Browser, BrowserContext, Page
+from playwright.async_api import async_playwright, Browser, BrowserContext, Dialog, Locator, Page, Request, Route
 import asyncio
+import time
 from pathlib import Path
-import base64
 from .base import ToolResult, BaseAnthropicTool
+from .browser_profile import BrowserProfile
+from .codegen import ASSERTIONS, ScriptRecorder, ScriptStep
+from .locator_cache import LocatorCache, element_key
+from .network_archive import HarMode, HarUnmatched, NetworkArchive
+from .page_scripts import ACCESSIBILITY_SNAPSHOT, DISABLE_ANIMATIONS, ELEMENT_LOCATORS, PAGE_FINGERPRINT, WAIT_FOR_SETTLE
+from .page_snapshot import PageSnapshot, describe_changes
+from .screenshot import ScreenshotConfig, ScreenshotStore, encode_screenshot, frame_changed, frame_signature
+from .trajectory import ReplayOutcome, Trajectory, TrajectoryStep
+from util.metrics import increment
+from util.tracing import span
 
 
 OUTPUT_DIR = Path("../screenshots")
 OUTPUT_DIR.mkdir(parents=True, exist_ok=True)
 
+# Returned instead of an image when a screenshot shows no visual change from the previous one
+NO_VISUAL_CHANGE = "No visual change since the previous screenshot."
+
+# Actions that only observe the page and can run alongside each other. Snapshots are not among
+# them: they reassign the element refs, which other calls of the same turn may be targeting.
+# Neither are assertions, which are recorded to the trajectory and script in the order they were
+# called.
+READ_ONLY_ACTIONS = {"screenshot", "get_content", "get_title"}
+
+# Actions that change the page, whose results can include what changed
+PAGE_CHANGING_ACTIONS = {"click", "type", "key", "navigate", "scroll", "mouse_move"}
+
+# Actions aimed at the element under their x, y. Other actions target an element only by ref:
+# a scroll's x, y are the distance to scroll, not a point on the page.
+POINTED_ACTIONS = {"click", "mouse_move"}
+
+# Tool input recorded on action spans. Typed text can be a password or other form data, so it
+# is never written to traces.
+SPAN_ATTRIBUTES = ("action", "ref", "x", "y")
+
+# Share of the settle timeout spent waiting for requests the action started. The rest is always
+# left for the DOM to go quiet, and requests that never finish, like long polls, cost no more.
+NETWORK_SETTLE_SHARE = 0.4
+
+# Seconds between checks of the requests in flight while waiting for them to finish
+NETWORK_POLL_INTERVAL = 0.02
+
 KEY_MAP = {
     "return": "Enter",
     "tab": "Tab",
@@ -20,33 +57,261 @@ KEY_MAP = {
 }
 
 
+def span_attributes(tool_input: dict[str, Any]) -> dict[str, Any]:
+    """Return the parts of an action's input that are safe to record on its span."""
+    return {key: tool_input[key] for key in SPAN_ATTRIBUTES if tool_input.get(key) is not None}
+
+
 class BrowserTool(BaseAnthropicTool):
     """
     Allows control and interactions with a browser
     """
 
     name = "browser"
-    _screenshot_delay = 2.0
-    screenshot_counter = 1
 
-    def __init__(self, website_url: str, width: int = 1920, height: int = 1080):
+    def __init__(
+            self,
+            website_url: str,
+            profile: BrowserProfile | None = None,
+            browser: Browser | None = None,
+            screenshot_dir: Path = OUTPUT_DIR,
+            settle_timeout: float = 5.0,
+            settle_quiet_ms: int = 50,
+            screenshot_config: ScreenshotConfig | None = None,
+            run_id: str = "default",
+            trajectory: Trajectory | None = None,
+            snapshot_max_elements: int = 200,
+            report_changes: bool = True,
+            max_change_lines: int = 20,
+            network_archive: NetworkArchive | None = None,
+            script_recorder: ScriptRecorder | None = None,
+            locator_cache: LocatorCache | None = None
+    ):
+        """
+        Args:
+            website_url: The URL opened when the browser starts
+            profile: Launch mode, viewport size, blocked requests and animations of the browser.
+                Defaults to a visible 1920x1080 browser that loads everything.
+            browser: An already launched browser to open a new context on. When omitted,
+                the tool launches (and later closes) its own Playwright instance and browser.
+            screenshot_dir: Directory of the content-addressed screenshot store
+            settle_timeout: Maximum seconds to wait for the page to settle after an action or
+                before a screenshot
+            settle_quiet_ms: How long the DOM must go without mutations to count as settled
+            screenshot_config: How screenshots are scaled and encoded. Coordinates given to
+                actions are in screenshot pixels and scaled back to the viewport.
+            run_id: Identifies this run's manifest in the screenshot store
+            trajectory: When given, every successful page-changing action is recorded to it
+            snapshot_max_elements: Maximum number of elements listed by the snapshot action
+            report_changes: Append what changed on the page (URL, title, dialogs and elements
+                added, removed or changed in the viewport) to the result of page-changing actions,
+                so the model often doesn't need a new screenshot to see the effect of an action
+            max_change_lines: Maximum number of element changes reported after an action
+            network_archive: A HAR file the browser context's traffic is recorded to, or served from
+            script_recorder: When given, every successful page-changing action and assertion is
+                recorded to it, with the element it targeted resolved to a locator when it ran
+            locator_cache: When given, the candidate locators of every element an action targets
+                are remembered in it, and trajectory replays find the elements of coordinate
+                actions through it instead of trusting the recorded coordinates
+        """
         self.website_url = website_url
         self.playwright = None
-        self.browser: Browser = None
+        self.browser: Browser = browser
         self.context: BrowserContext = None
         self.page: Page = None
-        self.width = width
-        self.height = height
+        self.profile = profile or BrowserProfile()
+        self.width = self.profile.width
+        self.height = self.profile.height
+        self.screenshot_store = ScreenshotStore(screenshot_dir, run_id)
+        self._owns_browser = browser is None
+        self.settle_timeout = settle_timeout
+        self.settle_quiet_ms = settle_quiet_ms
+        self.screenshot_config = screenshot_config or ScreenshotConfig()
+        # Size of the screenshots sent to the model, which is the coordinate space it acts in
+        self.screenshot_width, self.screenshot_height = self.screenshot_config.target_size(self.width, self.height)
+        self.screenshot_count = 0
+        self._last_frame_signature: bytes | None = None
+        self._last_screenshot_path: Path | None = None
+        self._screenshot_lock = asyncio.Lock()
+        # Requests of the page in flight, with when each started, and when the page last settled
+        self._requests: dict[Request, float] = {}
+        self._settled_at = 0.0
+        self.trajectory = trajectory
+        self.snapshot_max_elements = snapshot_max_elements
+        self.report_changes = report_changes
+        self.max_change_lines = max_change_lines
+        self.network_archive = network_archive
+        self.script_recorder = script_recorder
+        self.locator_cache = locator_cache
+        # The page as last observed through a snapshot or a change report, and dialogs opened since
+        self._last_snapshot: PageSnapshot | None = None
+        self._dialogs: list[str] = []
 
     async def __call__(self, **kwargs) -> ToolResult:
-        """Executes the tool with the given arguments."""
+        """Executes the tool with the given arguments, recording page-changing actions to the trajectory."""
+        if kwargs.get("action") == "batch":
+            steps = kwargs.get("steps") or []
+            with span("browser.batch", steps=len(steps)):
+                return await self.run_batch(steps, kwargs.get("stop_on_error", True))
+        with span(f"browser.{kwargs.get('action')}", **span_attributes(kwargs)):
+            return await self._run_step(kwargs, self.report_changes)
+
+    async def _run_step(self, tool_input: dict[str, Any], report_changes: bool) -> ToolResult:
+        """Run a single action, recording it to the trajectory and the script if it succeeds and changes the page."""
+        action = tool_input.get("action")
+        changes_page = action in PAGE_CHANGING_ACTIONS
+        url = self.page.url
+        # The target has to be resolved before the action, which may remove it or leave the page
+        resolve_target = (
+            changes_page
+            and (action in POINTED_ACTIONS or tool_input.get("ref") is not None)
+            and (self.script_recorder is not None or self.locator_cache is not None)
+        )
+        target = await self._describe_target(tool_input) if resolve_target else None
+
+        # Snapshots assign the element refs later steps target, and assertions belong in the
+        # generated script, so a replay must run them too
+        if self.trajectory is None or action in READ_ONLY_ACTIONS:
+            result = await self._run_observed(tool_input, report_changes)
+        else:
+            result = await self._run_recorded(tool_input, report_changes, target)
+        if result.error:
+            return result
+
+        if target is not None and self.locator_cache is not None:
+            target = self.locator_cache.remember(url, target)
+        if changes_page and self.script_recorder is not None:
+            step = self._script_step(tool_input, target)
+            if step:
+                self.script_recorder.record(step)
+        return result
+
+    async def _run_recorded(
+            self,
+            tool_input: dict[str, Any],
+            report_changes: bool,
+            target: dict[str, Any] | None = None
+    ) -> ToolResult:
+        """Run an action, appending it (and the key of the element it targeted) to the trajectory if it succeeds."""
+        url_before, fingerprint_before = await self.page_state()
+        start = time.monotonic()
+        result = await self._run_observed(tool_input, report_changes)
+        duration = time.monotonic() - start
+        if not result.error:
+            url_after, fingerprint_after = await self.page_state()
+            self.trajectory.steps.append(TrajectoryStep(
+                tool_input=dict(tool_input),
+                duration=duration,
+                url_before=url_before,
+                fingerprint_before=fingerprint_before,
+                url_after=url_after,
+                fingerprint_after=fingerprint_after,
+                output=result.output,
+                target=element_key(url_before, target) if target else None,
+            ))
+        return result
+
+    async def _run_observed(self, tool_input: dict[str, Any], report_changes: bool) -> ToolResult:
+        """Run an action, appending the changes it made to the page if it is a page-changing action."""
+        if not report_changes or tool_input.get("action") not in PAGE_CHANGING_ACTIONS:
+            return await self._run_action(**tool_input)
+
+        before = self._last_snapshot or await self._try_page_snapshot()
+        self._dialogs.clear()
+        result = await self._run_action(**tool_input)
+        after = await self._try_page_snapshot()
+        self._last_snapshot = after
+        if result.error or before is None or after is None:
+            return result
+        changes = describe_changes(before, after, self._to_screenshot, self._dialogs, self.max_change_lines)
+        return result.replace(output=f"{result.output}\n{changes}")
+
+    async def run_batch(self, steps: list[dict[str, Any]], stop_on_error: bool = True) -> ToolResult:
+        """
+        Run a sequence of actions in one call and report them in one result.
+
+        Page changes are reported once for the whole batch, and screenshot steps are merged into a
+        single screenshot taken after the last step. Each step may wait `wait_ms` extra milliseconds
+        after it runs. A failing step stops the batch unless `stop_on_error` is False; any failure
+        makes the whole result an error listing what each step did.
+        """
+        if not steps:
+            return ToolResult(error="A batch needs at least one step")
+
+        before = None
+        if self.report_changes:
+            before = self._last_snapshot or await self._try_page_snapshot()
+        self._dialogs.clear()
+
+        lines = []
+        failed = False
+        take_screenshot = False
+        for index, step in enumerate(steps, start=1):
+            action = step.get("action")
+            if action == "screenshot":
+                take_screenshot = True
+                continue
+            if action == "batch":
+                result = ToolResult(error="Batches can't be nested")
+            else:
+                with span(f"browser.{action}", **span_attributes(step)):
+                    result = await self._run_step(step, report_changes=False)
+
+            if result.error:
+                failed = True
+                lines.append(f"{index}. {action} failed: {result.error}")
+                if stop_on_error:
+                    skipped = len(steps) - index
+                    if skipped:
+                        lines.append(f"Stopped; the remaining {skipped} step(s) were not run.")
+                    break
+            else:
+                lines.append(f"{index}. {result.output}")
+            if step.get("wait_ms"):
+                await asyncio.sleep(step["wait_ms"] / 1000)
+
+        if self.report_changes:
+            after = await self._try_page_snapshot()
+            self._last_snapshot = after
+            if before is not None and after is not None:
+                lines.append(describe_changes(before, after, self._to_screenshot, self._dialogs, self.max_change_lines))
+
+        if failed:
+            return ToolResult(error="\n".join(lines))
+        if not take_screenshot:
+            return ToolResult(output="\n".join(lines))
+        screenshot = await self.take_screenshot()
+        return screenshot.replace(output="\n".join(lines + [screenshot.output]))
+
+    async def _try_page_snapshot(self) -> PageSnapshot | None:
+        """Take a page snapshot, or None if the page can't be evaluated (e.g. mid-navigation)."""
+        try:
+            with span("browser.observe"):
+                return await self._take_page_snapshot()
+        except Exception:
+            return None
+
+    async def _on_dialog(self, dialog: Dialog) -> None:
+        """Record a JavaScript dialog for the change report and dismiss it, as Playwright does by default."""
+        self._dialogs.append(f"{dialog.type} \"{dialog.message}\" (dismissed)")
+        await dialog.dismiss()
+
+    def _on_request(self, request: Request) -> None:
+        self._requests[request] = time.monotonic()
+
+    def _on_request_done(self, request: Request) -> None:
+        self._requests.pop(request, None)
+
+    async def _run_action(self, **kwargs) -> ToolResult:
+        """Dispatch an action to the method implementing it."""
         action = kwargs.get("action")
         text = kwargs.get("text")
         x = kwargs.get("x")
         y = kwargs.get("y")
         url = kwargs.get("url")
+        ref = kwargs.get("ref")
         
-        print(f"BrowserTool called: action={action}, x={x}, y={y}, text={text}")
+        print(f"BrowserTool called: action={action}, x={x}, y={y}, text={text}, ref={ref}")
         
         try:
             if action == "screenshot":
@@ -55,9 +320,18 @@ class BrowserTool(BaseAnthropicTool):
             elif action == "mouse_move" and x is not None and y is not None:
                 return await self.mouse_move(x, y)
             
+            elif action == "snapshot":
+                return await self.snapshot()
+            
+            elif action == "click" and ref is not None:
+                return await self.click_ref(ref)
+            
             elif action == "click" and x is not None and y is not None:
                 return await self.click(x, y)
             
+            elif action == "type" and text and ref is not None:
+                return await self.fill_ref(ref, text)
+            
             elif action == "type" and text:
                 return await self.type_text(text)
             
@@ -75,6 +349,9 @@ class BrowserTool(BaseAnthropicTool):
             
             elif action == "get_title":
                 return await self.get_page_title()
+
+            elif action == "assert" and kwargs.get("assertion"):
+                return await self.check_assertion(kwargs["assertion"], text, ref, x, y)
             
             else:
                 return ToolResult(error=f"Invalid action or missing parameters: action={action}")
@@ -84,12 +361,121 @@ class BrowserTool(BaseAnthropicTool):
             traceback.print_exc()
             return ToolResult(error=f"Error executing {action}: {str(e)}")
 
+    def resource_access(self, tool_input: dict[str, Any]) -> tuple[str, bool]:
+        """All actions act on this tool's page; only observing actions are read-only."""
+        return self.name, tool_input.get("action") in READ_ONLY_ACTIONS
+
     async def _get_viewport_size(self) -> tuple[int, int]:
         """Get current viewport size from the page"""
         width = await self.page.evaluate("window.innerWidth")
         height = await self.page.evaluate("window.innerHeight")
         return width, height
 
+    async def wait_for_settle(self) -> float:
+        """
+        Wait until the page has settled, capped at `settle_timeout` seconds.
+
+        The page is settled once the requests started since it last settled (those of the action)
+        have finished, the DOM has stopped mutating and no finite animations are running. Requests
+        already in flight before, such as long polls, are not waited for, and waiting for requests
+        takes at most NETWORK_SETTLE_SHARE of the timeout. Returns the number of seconds waited.
+        """
+        start = time.monotonic()
+        deadline = start + self.settle_timeout
+        network_deadline = start + self.settle_timeout * NETWORK_SETTLE_SHARE
+
+        def remaining_ms() -> float:
+            # Playwright takes a timeout of 0 as no timeout
+            return max((deadline - time.monotonic()) * 1000, 1)
+
+        while (
+            any(started >= self._settled_at for started in self._requests.values())
+            and time.monotonic() < network_deadline
+        ):
+            await asyncio.sleep(NETWORK_POLL_INTERVAL)
+
+        # A navigation started by the action destroys the evaluation context, so retry once on the new page
+        for _ in range(2):
+            if time.monotonic() >= deadline:
+                break
+            try:
+                await self.page.evaluate(WAIT_FOR_SETTLE, [self.settle_quiet_ms, remaining_ms()])
+                break
+            except Exception:
+                try:
+                    await self.page.wait_for_load_state("domcontentloaded", timeout=remaining_ms())
+                except Exception:
+                    break
+
+        self._settled_at = time.monotonic()
+        return self._settled_at - start
+
+    async def page_state(self) -> tuple[str, str]:
+        """Return the current URL and a structural fingerprint of the page."""
+        try:
+            return self.page.url, await self.page.evaluate(PAGE_FINGERPRINT)
+        except Exception:
+            # The page is mid-navigation; the URL alone still identifies it
+            return self.page.url, ''
+
+    async def replay(self, trajectory: Trajectory) -> ReplayOutcome:
+        """
+        Re-execute a recorded trajectory directly against the browser, without the model.
+
+        Before each step the page must match the URL and fingerprint recorded before that step,
+        and after the last step the state recorded after it. Replay stops at the first divergence
+        or failing action, including a recorded assertion that no longer holds.
+        """
+        assertions = 0
+        for index, step in enumerate(trajectory.steps):
+            await self.wait_for_settle()
+            url, fingerprint = await self.page_state()
+            if (url, fingerprint) != (step.url_before, step.fingerprint_before):
+                return ReplayOutcome(
+                    completed=False,
+                    steps_replayed=index,
+                    reason=f"page differs from the recorded run before step {index + 1} (now at {url})",
+                )
+            result = await self(**await self._retarget(step))
+            if result.error:
+                return ReplayOutcome(
+                    completed=False,
+                    steps_replayed=index,
+                    reason=f"step {index + 1} failed: {result.error}",
+                )
+            if step.tool_input.get("action") == "assert":
+                assertions += 1
+
+        await self.wait_for_settle()
+        if trajectory.steps:
+            last_step = trajectory.steps[-1]
+            url, fingerprint = await self.page_state()
+            if (url, fingerprint) != (last_step.url_after, last_step.fingerprint_after):
+                return ReplayOutcome(
+                    completed=False,
+                    steps_replayed=len(trajectory.steps),
+                    reason=f"final page differs from the recorded run (now at {url})",
+                )
+        return ReplayOutcome(completed=True, steps_replayed=len(trajectory.steps), assertions=assertions)
+
+    async def _retarget(self, step: TrajectoryStep) -> dict[str, Any]:
+        """Aim a recorded coordinate action at where its element is now, if the locator cache can find it."""
+        tool_input = step.tool_input
+        if (
+            self.locator_cache is None
+            or step.target is None
+            or tool_input.get("action") not in POINTED_ACTIONS
+            or tool_input.get("x") is None
+            or tool_input.get("ref") is not None
+        ):
+            return tool_input
+        locator = await self.locator_cache.locate(self.page, step.target)
+        box = await locator.bounding_box() if locator else None
+        if box is None:
+            return tool_input
+        x, y = self._to_screenshot(round(box["x"] + box["width"] / 2), round(box["y"] + box["height"] / 2))
+        return {**tool_input, "x": x, "y": y}
+
     async def __aenter__(self):
         """Async context manager entry"""
         await self.start()
@@ -100,65 +486,272 @@ class BrowserTool(BaseAnthropicTool):
         await self.close()
     
     async def start(self) -> None:
-        """Initialize the browser"""
-        self.playwright = await async_playwright().start()
-        self.browser = await self.playwright.chromium.launch(headless=False)
+        """Initialize the browser, or only a new context when sharing an existing browser"""
+        if self._owns_browser:
+            self.playwright = await async_playwright().start()
+            self.browser = await self.playwright.chromium.launch(headless=self.profile.headless)
         self.context = await self.browser.new_context(
-            viewport={'width': self.width, 'height': self.height}
+            viewport={'width': self.width, 'height': self.height},
+            reduced_motion="reduce" if self.profile.disable_animations else "no-preference",
         )
+        if self.profile.disable_animations:
+            await self.context.add_init_script(DISABLE_ANIMATIONS)
+        if self.profile.blocks_requests:
+            await self.context.route("**/*", self._route_request)
+        # Registered last so it sees requests first; unmatched requests fall back to the profile's route
+        if self.network_archive:
+            await self._attach_network_archive(self.network_archive)
         self.page = await self.context.new_page()
+        self.page.on("dialog", self._on_dialog)
+        self.page.on("request", self._on_request)
+        self.page.on("requestfinished", self._on_request_done)
+        self.page.on("requestfailed", self._on_request_done)
         await self.page.goto(self.website_url)
         
         # Update width/height with actual viewport size
         self.width, self.height = await self._get_viewport_size()
+        self.screenshot_width, self.screenshot_height = self.screenshot_config.target_size(self.width, self.height)
+        if self.script_recorder is not None:
+            self.script_recorder.viewport = (self.width, self.height)
+            self.script_recorder.headless = self.profile.headless
+
+    async def _attach_network_archive(self, archive: NetworkArchive) -> None:
+        """Record the context's traffic to the archive, or serve its requests from it."""
+        if archive.mode == HarMode.RECORD:
+            archive.path.parent.mkdir(parents=True, exist_ok=True)
+            await self.context.route_from_har(archive.path, update=True, update_content="embed")
+            print(f"[Recording network traffic to {archive.path}]")
+            return
+
+        if not archive.path.exists():
+            if archive.unmatched == HarUnmatched.FAIL:
+                raise FileNotFoundError(f"No network archive recorded for this test (expected {archive.path})")
+            print(f"[No network archive at {archive.path}, loading pages from the network]")
+            return
+        await self.context.route_from_har(
+            archive.path,
+            not_found="fallback" if archive.unmatched == HarUnmatched.PASSTHROUGH else "abort",
+        )
+        print(f"[Replaying network traffic from {archive.path}]")
+
+    async def _route_request(self, route: Route) -> None:
+        """Abort requests the profile blocks and let everything else through."""
+        request = route.request
+        if self.profile.should_block(request.resource_type, request.url):
+            increment("blocked_requests")
+            await route.abort("blockedbyclient")
+        else:
+            await route.continue_()
+
+    def _to_viewport(self, x: int, y: int) -> tuple[int, int]:
+        """Scale coordinates from screenshot pixels to viewport pixels."""
+        return (
+            round(x * self.width / self.screenshot_width),
+            round(y * self.height / self.screenshot_height),
+        )
+
+    def _to_screenshot(self, x: int, y: int) -> tuple[int, int]:
+        """Scale coordinates from viewport pixels to screenshot pixels."""
+        return (
+            round(x * self.screenshot_width / self.width),
+            round(y * self.screenshot_height / self.height),
+        )
 
     async def take_screenshot(self) -> ToolResult:
         """Take a screenshot and return as ToolResult"""
-        await asyncio.sleep(self._screenshot_delay)
-        screenshot_bytes = await self.page.screenshot(full_page=False)
-        screenshot_b64 = base64.b64encode(screenshot_bytes).decode('utf-8')
-        
-        # Also save to disk
-        screenshot_path = OUTPUT_DIR / f"screenshot_{self.screenshot_counter}.png"
-        with open(screenshot_path, 'wb') as f:
-            f.write(screenshot_bytes)
-        self.screenshot_counter += 1
-        print(f"Screenshot saved to: {screenshot_path}")
-        
+        await self.wait_for_settle()
+        # Screenshots of the same turn may run concurrently, but each is numbered and compared
+        # with the frame sent before it
+        async with self._screenshot_lock:
+            return await self._capture_screenshot()
+
+    async def _capture_screenshot(self) -> ToolResult:
+        with span("screenshot.capture") as capture:
+            screenshot_bytes = await self.page.screenshot(full_page=False)
+            capture.set(bytes=len(screenshot_bytes))
+        self.screenshot_count += 1
+        config = self.screenshot_config
+
+        # Comparing, scaling and encoding are CPU bound, keep them off the event loop
+        with span("screenshot.compare") as compare:
+            signature = await asyncio.to_thread(frame_signature, screenshot_bytes)
+            changed = frame_changed(self._last_frame_signature, signature, config.change_threshold)
+            compare.set(changed=changed)
+
+        if not changed and config.skip_unchanged:
+            if config.save_to_disk and self._last_screenshot_path:
+                await asyncio.to_thread(
+                    self.screenshot_store.record,
+                    self._last_screenshot_path,
+                    index=self.screenshot_count,
+                    url=self.page.url,
+                    unchanged=True,
+                )
+            print("Screenshot unchanged from the previous one")
+            return ToolResult(output=NO_VISUAL_CHANGE)
+        # Frames are compared with the last one sent, so slow changes still add up to a new frame
+        self._last_frame_signature = signature
+
+        with span("screenshot.encode", format=config.image_format) as encode:
+            screenshot = await asyncio.to_thread(encode_screenshot, screenshot_bytes, config)
+            encode.set(width=screenshot.width, height=screenshot.height, bytes=len(screenshot.data))
+        output = f"Screenshot taken. Viewport: {screenshot.width}x{screenshot.height}"
+
+        if config.save_to_disk:
+            with span("screenshot.write"):
+                screenshot_path = await asyncio.to_thread(
+                    self.screenshot_store.save,
+                    screenshot,
+                    index=self.screenshot_count,
+                    url=self.page.url,
+                    unchanged=not changed,
+                )
+            self._last_screenshot_path = screenshot_path
+            print(f"Screenshot saved to: {screenshot_path}")
+            output = f"Screenshot taken and saved to {screenshot_path}. Viewport: {screenshot.width}x{screenshot.height}"
+
         return ToolResult(
-            output=f"Screenshot taken and saved to {screenshot_path}. Viewport: {self.width}x{self.height}",
-            base64_image=screenshot_b64
+            output=output,
+            base64_image=screenshot.base64_data,
+            image_media_type=screenshot.media_type
         )
 
+    async def snapshot(self) -> ToolResult:
+        """Return an outline of the elements in the viewport, each with a ref actions can target"""
+        await self.wait_for_settle()
+        self._last_snapshot = await self._take_page_snapshot()
+        return ToolResult(output=self._last_snapshot.format(self._to_screenshot))
+
+    async def _take_page_snapshot(self) -> PageSnapshot:
+        result = await self.page.evaluate(ACCESSIBILITY_SNAPSHOT, self.snapshot_max_elements)
+        return PageSnapshot.from_page_result(result, self.page.url, await self.page.title())
+
+    def _ref_locator(self, ref: int) -> Locator:
+        """Locate the element a snapshot gave `ref`."""
+        return self.page.locator(f'[data-agent-ref="{int(ref)}"]')
+
+    async def click_ref(self, ref: int) -> ToolResult:
+        """Click the element with a snapshot ref"""
+        locator = self._ref_locator(ref)
+        if not await locator.count():
+            return ToolResult(error=f"No element with ref {ref} on the page. Take a new snapshot.")
+        await locator.click(timeout=self.settle_timeout * 1000)
+        await self.wait_for_settle()
+        return ToolResult(output=f"Clicked ref {ref}")
+
+    async def fill_ref(self, ref: int, text: str) -> ToolResult:
+        """Replace the value of the input with a snapshot ref"""
+        locator = self._ref_locator(ref)
+        if not await locator.count():
+            return ToolResult(error=f"No element with ref {ref} on the page. Take a new snapshot.")
+        await locator.fill(text, timeout=self.settle_timeout * 1000)
+        await self.wait_for_settle()
+        return ToolResult(output=f"Typed into ref {ref}: {text}")
+
+    async def _describe_target(self, tool_input: dict[str, Any]) -> dict[str, Any] | None:
+        """Describe the element an action targets by ref or point, or None if there is none."""
+        ref = tool_input.get("ref")
+        x, y = tool_input.get("x"), tool_input.get("y")
+        if ref is None and (x is None or y is None):
+            return None
+        point = self._to_viewport(x, y) if ref is None else (None, None)
+        try:
+            return await self.page.evaluate(ELEMENT_LOCATORS, [*point, ref])
+        except Exception as e:
+            print(f"Couldn't describe the target of {tool_input.get('action')}: {e}")
+            return None
+
+    def _script_step(self, tool_input: dict[str, Any], target: dict[str, Any] | None) -> ScriptStep | None:
+        """Translate a successful action into a script step, or None if it can't be replayed."""
+        action = tool_input["action"]
+        text = tool_input.get("text")
+        x, y = tool_input.get("x"), tool_input.get("y")
+        if x is not None and y is not None:
+            x, y = self._to_viewport(x, y)
+        if action in ("click", "mouse_move"):
+            if target is None and tool_input.get("ref") is not None:
+                return None
+            return ScriptStep("click" if action == "click" else "hover", target, x=x, y=y)
+        if action == "type":
+            # Typing into a ref replaces the element's value
+            return ScriptStep("fill", target, text=text) if target else ScriptStep("type", text=text)
+        if action == "key":
+            return ScriptStep("press", text=KEY_MAP.get(text, text))
+        if action == "scroll":
+            return ScriptStep("scroll", x=x, y=y)
+        if action == "navigate":
+            return ScriptStep("goto", text=tool_input.get("url"))
+        return None
+
+    async def check_assertion(self, assertion: str, expected: str | None, ref: int | None, x: int | None, y: int | None) -> ToolResult:
+        """Check an assertion on the current page, adding it to the generated script if it holds"""
+        if assertion not in ASSERTIONS:
+            return ToolResult(error=f"Unknown assertion: {assertion}")
+
+        target = None
+        if assertion == "url":
+            actual = self.page.url
+        elif assertion == "title":
+            actual = await self.page.title()
+        else:
+            target = await self._describe_target({"action": "assert", "ref": ref, "x": x, "y": y})
+            if target is None:
+                return ToolResult(error=f"The {assertion} assertion needs the ref or coordinates of an element on the page")
+            actual = target[assertion]
+
+        if assertion in ("visible", "checked"):
+            passed = bool(actual)
+        elif expected is None:
+            return ToolResult(error=f"The {assertion} assertion needs the expected text")
+        elif assertion == "value":
+            passed = actual == expected
+        else:
+            passed = actual is not None and " ".join(expected.split()) in actual
+
+        if not passed and assertion in ("visible", "checked"):
+            return ToolResult(error=f"Assertion failed: the element is not {assertion}")
+        if not passed:
+            return ToolResult(error=f"Assertion failed: the {assertion} is {actual!r}, expected {expected!r}")
+        if self.script_recorder is not None:
+            self.script_recorder.record(ScriptStep("expect", target, text=expected, assertion=assertion))
+        return ToolResult(output=f"Assertion passed: {assertion} {expected!r}" if expected else f"Assertion passed: {assertion}")
+
     async def click(self, x: int, y: int) -> ToolResult:
         """Click at coordinates"""
-        await self.page.mouse.click(x, y)
+        await self.page.mouse.click(*self._to_viewport(x, y))
+        await self.wait_for_settle()
         return ToolResult(output=f"Clicked at ({x}, {y})")
 
     async def type_text(self, text: str) -> ToolResult:
         """Type text at current cursor position"""
         await self.page.keyboard.type(text)
+        await self.wait_for_settle()
         return ToolResult(output=f"Typed: {text}")
 
     async def press_key(self, key: str) -> ToolResult:
         """Press a key"""
         playwright_key = KEY_MAP.get(key, key)
         await self.page.keyboard.press(playwright_key)
+        await self.wait_for_settle()
         return ToolResult(output=f"Pressed key: {key}")
 
     async def scroll(self, x: int, y: int) -> ToolResult:
         """Scroll by x, y pixels"""
-        await self.page.evaluate(f"window.scrollBy({x}, {y})")
+        scroll_x, scroll_y = self._to_viewport(x, y)
+        await self.page.evaluate(f"window.scrollBy({scroll_x}, {scroll_y})")
+        await self.wait_for_settle()
         return ToolResult(output=f"Scrolled by ({x}, {y})")
 
     async def mouse_move(self, x: int, y: int) -> ToolResult:
         """Move mouse to coordinates"""
-        await self.page.mouse.move(x, y)
+        await self.page.mouse.move(*self._to_viewport(x, y))
+        await self.wait_for_settle()
         return ToolResult(output=f"Mouse moved to ({x}, {y})")
 
     async def navigate(self, url: str) -> ToolResult:
         """Navigate to a new URL"""
         await self.page.goto(url)
+        await self.wait_for_settle()
         return ToolResult(output=f"Navigated to: {url}")
 
     async def get_page_content(self) -> ToolResult:
@@ -173,42 +766,88 @@ class BrowserTool(BaseAnthropicTool):
 
     def to_params(self) -> dict[str, Any]:
         """Convert object to API parameters for custom tool."""
+        step_properties = {
+            "action": {
+                "type": "string",
+                "enum": [
+                    "screenshot",
+                    "snapshot",
+                    "click",
+                    "type",
+                    "key",
+                    "navigate",
+                    "scroll",
+                    "mouse_move",
+                    "get_content",
+                    "get_title",
+                    "assert"
+                ],
+                "description": "The action to perform"
+            },
+            "assertion": {
+                "type": "string",
+                "enum": list(ASSERTIONS),
+                "description": "For assert: what to check. visible, text (contains), value and checked "
+                               "check the element at ref or x, y; url and title (contain) check the page."
+            },
+            "text": {
+                "type": "string",
+                "description": "Text to type, key to press or, for assert, the expected text"
+            },
+            "x": {
+                "type": "integer",
+                "description": "X coordinate (in screenshot pixels) for click or mouse move"
+            },
+            "y": {
+                "type": "integer",
+                "description": "Y coordinate (in screenshot pixels) for click or mouse move"
+            },
+            "url": {
+                "type": "string",
+                "description": "URL to navigate to"
+            },
+            "ref": {
+                "type": "integer",
+                "description": "Element ref from the latest snapshot, for click and type instead of "
+                               "coordinates. Typing into a ref replaces the element's value."
+            }
+        }
         return {
             "name": self.name,
-            "description": "Control a web browser to navigate, click, type, and take screenshots",
+            "description": (
+                "Control a web browser to navigate, click, type, and take screenshots. "
+                "The snapshot action returns a text outline of the elements in the viewport, each with a "
+                "ref that click and type can target instead of coordinates; it is much cheaper than a screenshot. "
+                "The batch action runs a list of steps in one call, e.g. filling in every field of a form. "
+                "The assert action checks the expected outcome on the live page."
+            ),
             "input_schema": {
                 "type": "object",
                 "properties": {
+                    **step_properties,
                     "action": {
-                        "type": "string",
-                        "enum": [
-                            "screenshot",
-                            "click",
-                            "type",
-                            "key",
-                            "navigate",
-                            "scroll",
-                            "mouse_move",
-                            "get_content",
-                            "get_title"
-                        ],
-                        "description": "The action to perform"
-                    },
-                    "text": {
-                        "type": "string",
-                        "description": "Text to type or key to press"
+                        **step_properties["action"],
+                        "enum": [*step_properties["action"]["enum"], "batch"],
                     },
-                    "x": {
-                        "type": "integer",
-                        "description": "X coordinate for click or mouse move"
+                    "steps": {
+                        "type": "array",
+                        "description": "For batch: the actions to run in order. A screenshot step is taken "
+                                       "once, after all other steps.",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                **step_properties,
+                                "wait_ms": {
+                                    "type": "integer",
+                                    "description": "Extra milliseconds to wait after this step"
+                                }
+                            },
+                            "required": ["action"]
+                        }
                     },
-                    "y": {
-                        "type": "integer",
-                        "description": "Y coordinate for click or mouse move"
-                    },
-                    "url": {
-                        "type": "string",
-                        "description": "URL to navigate to"
+                    "stop_on_error": {
+                        "type": "boolean",
+                        "description": "For batch: stop at the first failing step (default true)"
                     }
                 },
                 "required": ["action"]
@@ -217,6 +856,12 @@ class BrowserTool(BaseAnthropicTool):
 
     async def close(self) -> None:
         """Clean up resources"""
+        try:
+            if self.locator_cache is not None:
+                self.locator_cache.save()
+        except Exception as e:
+            print(f"Error saving locator cache: {e}")
+
         try:
             if self.page:
                 await self.page.close()
@@ -229,6 +874,10 @@ class BrowserTool(BaseAnthropicTool):
         except Exception as e:
             print(f"Error closing context: {e}")
 
+        # A shared browser is owned (and closed) by whoever launched it
+        if not self._owns_browser:
+            return
+
         try:
             if self.browser:
                 await self.browser.close()
@@ -0,0 +1,87 @@
+from dataclasses import dataclass
+from urllib.parse import urlparse
+
+# Ad, analytics and tracking hosts; a request is blocked if its host is one of these or a subdomain
+TRACKER_DOMAINS = (
+    "doubleclick.net",
+    "googlesyndication.com",
+    "googleadservices.com",
+    "google-analytics.com",
+    "googletagmanager.com",
+    "googletagservices.com",
+    "adservice.google.com",
+    "imasdk.googleapis.com",
+    "connect.facebook.net",
+    "ads-twitter.com",
+    "analytics.twitter.com",
+    "scorecardresearch.com",
+    "quantserve.com",
+    "criteo.com",
+    "taboola.com",
+    "outbrain.com",
+    "adnxs.com",
+    "amazon-adsystem.com",
+    "hotjar.com",
+    "segment.io",
+    "newrelic.com",
+    "nr-data.net",
+)
+
+# Playwright resource types that can be blocked
+RESOURCE_TYPES = {
+    "document", "stylesheet", "image", "media", "font", "script", "texttrack", "xhr", "fetch",
+    "eventsource", "websocket", "manifest", "other",
+}
+
+
+@dataclass(frozen=True)
+class BrowserProfile:
+    """
+    How the browser is launched and which requests its pages may make.
+
+    `headless` only applies when the browser tool launches its own browser; a shared browser is
+    launched by its owner. Requests whose Playwright resource type is in `block_resource_types`
+    or whose host is in `block_domains` (or a subdomain of one) are aborted. Intercepting requests
+    disables the HTTP cache, so profiles without blocking don't intercept at all.
+
+    With `disable_animations`, pages are told the user prefers reduced motion and CSS animations,
+    transitions and smooth scrolling are turned off, so screenshots don't catch elements mid-motion.
+    """
+    headless: bool = False
+    width: int = 1920
+    height: int = 1080
+    block_resource_types: frozenset[str] = frozenset()
+    block_domains: tuple[str, ...] = ()
+    disable_animations: bool = False
+
+    def __post_init__(self):
+        unknown = self.block_resource_types - RESOURCE_TYPES
+        if unknown:
+            raise ValueError(f"Unknown resource types: {', '.join(sorted(unknown))}")
+
+    @property
+    def blocks_requests(self) -> bool:
+        """Whether any requests are blocked, i.e. whether requests need to be intercepted."""
+        return bool(self.block_resource_types or self.block_domains)
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        """Return whether a request for `url` of the given Playwright resource type is blocked."""
+        if resource_type in self.block_resource_types:
+            return True
+        host = urlparse(url).hostname or ""
+        return any(host == domain or host.endswith("." + domain) for domain in self.block_domains)
+
+
+PROFILES = {
+    # A visible, full HD browser that loads everything, for watching a run
+    "default": BrowserProfile(),
+    # Headless with a smaller viewport, no video, audio, web fonts, ads or trackers, and no animations
+    "fast": BrowserProfile(
+        headless=True,
+        width=1280,
+        height=800,
+        block_resource_types=frozenset({"media", "font"}),
+        block_domains=TRACKER_DOMAINS,
+        disable_animations=True,
+    ),
+}
@@ -0,0 +1,128 @@
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Optional
+
+# Assertions the browser tool can check, and the Playwright expectation each one becomes
+ASSERTIONS = {
+    "visible": "expect({locator}).to_be_visible()",
+    "text": "expect({locator}).to_contain_text({expected})",
+    "value": "expect({locator}).to_have_value({expected})",
+    "checked": "expect({locator}).to_be_checked()",
+    "url": "expect(page).to_have_url(re.compile(re.escape({expected})))",
+    "title": "expect(page).to_have_title(re.compile(re.escape({expected})))",
+}
+
+INDENT = " " * 8
+
+
+@dataclass
+class ScriptStep:
+    """
+    A successful browser action, as it is written to the generated script.
+
+    `target` describes the element the action was aimed at when it ran, as returned by
+    ELEMENT_LOCATORS; without one the action is replayed at viewport coordinates `x`, `y`.
+    """
+    action: str
+    target: Optional[dict[str, Any]] = None
+    text: Optional[str] = None
+    x: Optional[int] = None
+    y: Optional[int] = None
+    assertion: Optional[str] = None
+
+
+@dataclass
+class ScriptRecorder:
+    """
+    Collects the successful browser actions and assertions of a run and writes them as a Playwright script.
+
+    `viewport` and `headless` are taken from the browser the run used, so the script replays it
+    in the same browser setup.
+    """
+    website_url: str
+    viewport: tuple[int, int] = (1920, 1080)
+    headless: bool = False
+    steps: list[ScriptStep] = field(default_factory=list)
+
+    def record(self, step: ScriptStep) -> None:
+        self.steps.append(step)
+
+    def render(self, test_name: str, description: str = '') -> str:
+        """Return the script as a Python module with one test function named `test_name`."""
+        body = [f"{INDENT}{render_step(step)}" for step in self.steps]
+        uses_re = any(step.assertion in ("url", "title") for step in self.steps)
+        width, height = self.viewport
+        lines = [f"# {line}".rstrip() for line in description.strip().splitlines()]
+        lines += [
+            "# Generated from the browser actions of a passing agent run.",
+            "",
+            *(["import re", ""] if uses_re else []),
+            "from playwright.sync_api import expect, sync_playwright",
+            "",
+            "",
+            f"def {test_name}():",
+            "    with sync_playwright() as p:",
+            f"        browser = p.chromium.launch(headless={self.headless})",
+            f"        context = browser.new_context(viewport={{'width': {width}, 'height': {height}}})",
+            "        page = context.new_page()",
+            f"        page.goto({self.website_url!r})",
+            *body,
+            "        browser.close()",
+            "",
+            "",
+            'if __name__ == "__main__":',
+            f"    {test_name}()",
+            "",
+        ]
+        return "\n".join(lines)
+
+    def save(self, path: Path, description: str = '') -> Path:
+        """Write the script to `path`, naming its test function after the file."""
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        test_name = re.sub(r"\W", "_", path.stem)
+        if not test_name.startswith("test"):
+            test_name = f"test_{test_name}"
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(self.render(test_name, description))
+        return path
+
+
+def locator_expression(target: dict[str, Any]) -> str:
+    """Return the Playwright locator for the most robust of the target's locator candidates."""
+    candidate = target["candidates"][0]
+    kind = candidate["kind"]
+    if kind == "test_id":
+        return f"page.get_by_test_id({candidate['value']!r})"
+    if kind == "role":
+        exact = ", exact=True" if candidate["exact"] else ""
+        return f"page.get_by_role({candidate['role']!r}, name={candidate['name']!r}{exact})"
+    if kind == "placeholder":
+        return f"page.get_by_placeholder({candidate['value']!r}, exact=True)"
+    if kind == "text":
+        return f"page.get_by_text({candidate['value']!r}, exact=True)"
+    return f"page.locator({candidate['value']!r})"
+
+
+def render_step(step: ScriptStep) -> str:
+    """Return the script line replaying a step."""
+    locator = locator_expression(step.target) if step.target else None
+    if step.action == "goto":
+        return f"page.goto({step.text!r})"
+    if step.action == "click":
+        return f"{locator}.click()" if locator else f"page.mouse.click({step.x}, {step.y})"
+    if step.action == "hover":
+        return f"{locator}.hover()" if locator else f"page.mouse.move({step.x}, {step.y})"
+    if step.action == "fill":
+        return f"{locator}.fill({step.text!r})"
+    if step.action == "type":
+        return f"page.keyboard.type({step.text!r})"
+    if step.action == "press":
+        return f"page.keyboard.press({step.text!r})"
+    if step.action == "scroll":
+        # The browser tool scrolls the window, not the element under the mouse
+        return f'page.evaluate("window.scrollBy({step.x}, {step.y})")'
+    if step.action == "expect":
+        return ASSERTIONS[step.assertion].format(locator=locator, expected=repr(step.text))
+    raise ValueError(f"Unknown script step: {step.action}")
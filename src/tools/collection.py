@@ -1,6 +1,8 @@
-from typing import Any, Dict, List
+import asyncio
+from typing import Any, Dict, List, Tuple
 from anthropic.types import ToolUnionParam
 from .base import BaseAnthropicTool, ToolError, ToolFailure, ToolResult
+from util.tracing import span
 
 
 class ToolCollection:
@@ -27,12 +29,75 @@ class ToolCollection:
         if not tool:
             return ToolFailure(error=f"Tool '{name}' is invalid")
 
-        try:
-            # Execute the tool asynchronously
-            return await tool(**tool_input)
-        except ToolError as e:
-            # Handle known tool errors
-            return ToolFailure(error=e.message)
-        except Exception as e:
-            # Handle unexpected exceptions
-            return ToolFailure(error=f"Unexpected error: {e}")
\ No newline at end of file
+        with span(f"tool.{name}", action=tool_input.get("action")) as tool_span:
+            try:
+                # Execute the tool asynchronously
+                result = await tool(**tool_input)
+            except ToolError as e:
+                # Handle known tool errors
+                result = ToolFailure(error=e.message)
+            except Exception as e:
+                # Handle unexpected exceptions
+                result = ToolFailure(error=f"Unexpected error: {e}")
+            if result.error:
+                tool_span.set(error=result.error)
+            return result
+
+    def scheduler(self) -> "ToolScheduler":
+        """Create a scheduler for the tool calls of one turn."""
+        return ToolScheduler(self)
+
+
+class ToolScheduler:
+    """
+    Schedules the tool calls of one turn, running independent calls concurrently.
+
+    Each call is classified by its tool's `resource_access`. A call that mutates a resource waits
+    for every earlier call on that resource; a read-only call only waits for earlier mutating
+    calls on it. Calls on different resources never wait for each other.
+    """
+
+    def __init__(self, tool_collection: ToolCollection):
+        self.tool_collection = tool_collection
+        self.tasks: Dict[str, asyncio.Task[ToolResult]] = {}
+        # resource -> (last mutating call, read-only calls issued since)
+        self._resources: Dict[str, Tuple[asyncio.Task | None, List[asyncio.Task]]] = {}
+
+    def submit(self, tool_use_id: str, *, name: str, tool_input: Dict[str, Any]) -> asyncio.Task[ToolResult]:
+        """Start a tool call as soon as the calls it depends on have finished."""
+        tool = self.tool_collection.tool_map.get(name)
+        resource, read_only = tool.resource_access(tool_input) if tool else (name, False)
+
+        last_write, reads = self._resources.get(resource, (None, []))
+        dependencies = [last_write] if last_write else []
+        if not read_only:
+            dependencies += reads
+
+        task = asyncio.create_task(
+            self._run_after(dependencies, name, tool_input), name=f"{name} {tool_use_id}"
+        )
+        if read_only:
+            self._resources[resource] = (last_write, reads + [task])
+        else:
+            self._resources[resource] = (task, [])
+
+        self.tasks[tool_use_id] = task
+        return task
+
+    async def _run_after(
+        self, dependencies: List[asyncio.Task], name: str, tool_input: Dict[str, Any]
+    ) -> ToolResult:
+        """Wait for the given calls to finish, then run the tool."""
+        if dependencies:
+            with span("tool.wait", tool=name):
+                await asyncio.wait(dependencies)
+        return await self.tool_collection.run(name=name, tool_input=tool_input)
+
+    async def results(self) -> List[Tuple[str, ToolResult]]:
+        """Wait for all submitted calls and return their results in submission order."""
+        return [(tool_use_id, await task) for tool_use_id, task in self.tasks.items()]
+
+    def cancel(self) -> None:
+        """Cancel every call that has not finished yet."""
+        for task in self.tasks.values():
+            task.cancel()
@@ -0,0 +1,156 @@
+import json
+import re
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+from urllib.parse import urlparse
+
+from playwright.async_api import Locator, Page
+
+LOCATOR_DIR = Path("../locators")
+
+# Roles whose fallback name is their current value, as in ELEMENT_LOCATORS
+VALUE_ROLES = {"textbox", "searchbox", "combobox", "spinbutton"}
+
+_shared_caches: dict[Path, "LocatorCache"] = {}
+
+
+class LocatorCache:
+    """
+    Remembers how to find the elements actions targeted, per origin, across runs.
+
+    Each element is keyed by the page path plus its role and accessible name (or its text, or
+    its CSS path when it has neither). Its entry holds the candidate locators ELEMENT_LOCATORS
+    found for it, each with the number of times it was seen unique on the page. Candidates that
+    have been seen the most come first, so scripts and replays prefer locators that kept working.
+    A candidate that no longer resolves to exactly one element is dropped.
+
+    Entries are kept in memory and written to `<cache_dir>/<origin>.json` by `save`.
+    """
+
+    def __init__(self, cache_dir: Path = LOCATOR_DIR):
+        self.cache_dir = Path(cache_dir)
+        self._origins: dict[str, dict[str, Any]] = {}
+        self._dirty: set[str] = set()
+
+    def remember(self, url: str, target: dict[str, Any]) -> dict[str, Any]:
+        """
+        Record the candidates just resolved for the target of an action on `url`.
+
+        Returns the target with its candidates ordered by how often each was seen.
+        """
+        origin, entries = self._entries(url)
+        key = element_key(url, target)
+        previous = {_candidate_id(candidate): candidate["hits"] for candidate in entries.get(key, {}).get("candidates", [])}
+        # Candidates missing this time were not unique any more, so only the current ones are kept
+        candidates = [
+            {**candidate, "hits": previous.get(_candidate_id(candidate), 0) + 1}
+            for candidate in target["candidates"]
+        ]
+        candidates.sort(key=lambda candidate: -candidate["hits"])
+        entries[key] = {"candidates": candidates, "last_seen": datetime.now().isoformat()}
+        self._dirty.add(origin)
+        return {**target, "candidates": [_without_hits(candidate) for candidate in candidates]}
+
+    def candidates(self, url: str, key: str) -> list[dict[str, Any]]:
+        """Return the known candidates for an element of the origin of `url`, most seen first."""
+        _, entries = self._entries(url)
+        return [_without_hits(candidate) for candidate in entries.get(key, {}).get("candidates", [])]
+
+    def invalidate(self, url: str, key: str, candidate: dict[str, Any]) -> None:
+        """Drop a candidate that no longer finds its element, and the element once none are left."""
+        origin, entries = self._entries(url)
+        entry = entries.get(key)
+        if entry is None:
+            return
+        entry["candidates"] = [known for known in entry["candidates"] if _candidate_id(known) != _candidate_id(candidate)]
+        if not entry["candidates"]:
+            del entries[key]
+        self._dirty.add(origin)
+
+    async def locate(self, page: Page, key: str) -> Optional[Locator]:
+        """Find an element of the current page by its known candidates, invalidating the ones that fail."""
+        for candidate in self.candidates(page.url, key):
+            locator = candidate_locator(page, candidate)
+            if await locator.count() == 1:
+                return locator
+            self.invalidate(page.url, key, candidate)
+        return None
+
+    def save(self) -> None:
+        """Write the origins changed since the last save to disk."""
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        for origin in self._dirty:
+            with open(self._path(origin), 'w', encoding='utf-8') as file:
+                json.dump(self._origins[origin], file, indent=2)
+        self._dirty.clear()
+
+    def _entries(self, url: str) -> tuple[str, dict[str, Any]]:
+        """Return the origin of `url` and its entries, loading them from disk on first use."""
+        parsed = urlparse(url)
+        origin = f"{parsed.scheme}://{parsed.netloc}"
+        if origin not in self._origins:
+            path = self._path(origin)
+            if path.exists():
+                with open(path, 'r', encoding='utf-8') as file:
+                    self._origins[origin] = json.load(file)
+            else:
+                self._origins[origin] = {}
+        return origin, self._origins[origin]
+
+    def _path(self, origin: str) -> Path:
+        return self.cache_dir / f"{re.sub(r'[^A-Za-z0-9.-]+', '_', origin)}.json"
+
+
+def get_locator_cache(cache_dir: Path = LOCATOR_DIR) -> LocatorCache:
+    """Return the cache shared by all runs in this process that use `cache_dir`."""
+    cache_dir = Path(cache_dir)
+    if cache_dir not in _shared_caches:
+        _shared_caches[cache_dir] = LocatorCache(cache_dir)
+    return _shared_caches[cache_dir]
+
+
+def element_key(url: str, target: dict[str, Any]) -> str:
+    """Identify the element described by `target` on the page at `url`."""
+    path = urlparse(url).path or "/"
+    if target["role"] and target["name"] and not _named_by_value(target):
+        return f"{path} {target['role']} {target['name']}"
+    if target["text"] and len(target["text"]) <= 80:
+        return f"{path} text {target['text']}"
+    return f"{path} css {target['candidates'][-1]['value']}"
+
+
+def candidate_locator(page: Page, candidate: dict[str, Any]) -> Locator:
+    """Return the Playwright locator for a candidate found by ELEMENT_LOCATORS."""
+    kind = candidate["kind"]
+    if kind == "test_id":
+        return page.get_by_test_id(candidate["value"])
+    if kind == "role":
+        return page.get_by_role(candidate["role"], name=candidate["name"], exact=candidate["exact"])
+    if kind == "placeholder":
+        return page.get_by_placeholder(candidate["value"], exact=True)
+    if kind == "text":
+        return page.get_by_text(candidate["value"], exact=True)
+    return page.locator(candidate["value"])
+
+
+def _named_by_value(target: dict[str, Any]) -> bool:
+    """
+    Whether the target's name is its current value, which unlabelled fields can be named after.
+
+    Such a name changes with what was typed and may be a password, so it never keys an element.
+    """
+    if target["role"] not in VALUE_ROLES or not target.get("value"):
+        return False
+    value = " ".join(target["value"].split())
+    name = target["name"]
+    # Long names are cut and end in '...'
+    return name == value or name.endswith("...") and value.startswith(name[:-3])
+
+
+def _candidate_id(candidate: dict[str, Any]) -> str:
+    return json.dumps(_without_hits(candidate), sort_keys=True)
+
+
+def _without_hits(candidate: dict[str, Any]) -> dict[str, Any]:
+    return {key: value for key, value in candidate.items() if key != "hits"}
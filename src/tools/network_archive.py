@@ -0,0 +1,45 @@
+from dataclasses import dataclass
+from enum import StrEnum
+from pathlib import Path
+
+from .trajectory import trajectory_key
+
+HAR_DIR = Path("../hars")
+
+
+class HarMode(StrEnum):
+    RECORD = "record"
+    REPLAY = "replay"
+
+
+class HarUnmatched(StrEnum):
+    """What happens to a replayed request that has no response in the archive."""
+    PASSTHROUGH = "passthrough"
+    FAIL = "fail"
+
+
+@dataclass(frozen=True)
+class NetworkArchive:
+    """
+    Records a run's network traffic to a HAR file, or serves the run's requests from one.
+
+    In record mode every response the browser context receives is written to `path` (with bodies
+    embedded) when the context closes, replacing any earlier recording. In replay mode requests
+    matching a recorded one by URL, method and body are answered from the archive without touching
+    the network; the others go to the network (`HarUnmatched.PASSTHROUGH`) or fail (`FAIL`).
+    """
+    path: Path
+    mode: HarMode = HarMode.REPLAY
+    unmatched: HarUnmatched = HarUnmatched.PASSTHROUGH
+
+    @classmethod
+    def for_test(
+            cls,
+            website: str,
+            instructions: str,
+            mode: HarMode = HarMode.REPLAY,
+            unmatched: HarUnmatched = HarUnmatched.PASSTHROUGH,
+            har_dir: Path = HAR_DIR
+    ) -> "NetworkArchive":
+        """Return the archive of a test, stored under the same key as its trajectory."""
+        return cls(Path(har_dir) / f"{trajectory_key(website, instructions)}.har", HarMode(mode), HarUnmatched(unmatched))
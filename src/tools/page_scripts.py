@@ -0,0 +1,398 @@
+"""JavaScript snippets evaluated in the page by the browser tool."""
+
+# Resolves once the DOM has seen no mutations for `quietMs` and no finite CSS animations or
+# transitions are running, checked once per animation frame, or after `timeoutMs` at the latest.
+# Resolves with the number of milliseconds waited.
+WAIT_FOR_SETTLE = """
+([quietMs, timeoutMs]) => new Promise(resolve => {
+    const start = performance.now();
+    let lastMutation = start;
+    const observer = new MutationObserver(() => { lastMutation = performance.now(); });
+    observer.observe(document, { subtree: true, childList: true, attributes: true, characterData: true });
+
+    const animating = () => document.getAnimations().some(animation =>
+        animation.playState === 'running' &&
+        animation.effect && animation.effect.getTiming().iterations !== Infinity
+    );
+
+    const check = () => {
+        const now = performance.now();
+        const quiet = now - lastMutation >= quietMs && !animating();
+        if (quiet || now - start >= timeoutMs) {
+            observer.disconnect();
+            resolve(now - start);
+        } else {
+            requestAnimationFrame(check);
+        }
+    };
+    // Let at least one frame render before checking
+    requestAnimationFrame(() => requestAnimationFrame(check));
+})
+"""
+
+# Hashes the set of visible form controls, buttons and dialogs on the page (tag, type, role and
+# identifying attributes, not their text) into a short hex string. Content such as feeds and
+# timestamps is deliberately left out so the fingerprint only changes when the page structure does.
+PAGE_FINGERPRINT = """
+() => {
+    const selector = 'input, textarea, select, button, [role=button], [role=textbox], [role=searchbox], ' +
+        '[role=combobox], [role=dialog], [role=alertdialog], dialog[open]';
+    const signatures = new Set();
+    for (const element of document.querySelectorAll(selector)) {
+        const rect = element.getBoundingClientRect();
+        if (rect.width === 0 || rect.height === 0) continue;
+        signatures.add([
+            element.tagName.toLowerCase(),
+            element.getAttribute('type') || '',
+            element.getAttribute('role') || '',
+            element.id || '',
+            element.getAttribute('name') || '',
+            element.getAttribute('aria-label') || '',
+        ].join('|'));
+    }
+    let hash = 2166136261;
+    for (const char of [...signatures].sort().join('\\n')) {
+        hash ^= char.charCodeAt(0);
+        hash = Math.imul(hash, 16777619);
+    }
+    return (hash >>> 0).toString(16).padStart(8, '0');
+}
+"""
+
+# Role, accessible name and visibility helpers shared by the scripts that describe elements.
+# Accessible names are whitespace-collapsed and cut to MAX_NAME characters (ending in '...').
+_ELEMENT_HELPERS = """
+    const INTERACTIVE_ROLES = new Set(['button', 'link', 'textbox', 'searchbox', 'checkbox', 'radio',
+        'combobox', 'listbox', 'option', 'menuitem', 'menuitemcheckbox', 'menuitemradio', 'tab',
+        'switch', 'slider', 'spinbutton', 'treeitem']);
+    // Roles whose accessible name comes from their text content when not labelled otherwise
+    const NAME_FROM_CONTENT = new Set(['button', 'link', 'heading', 'tab', 'option', 'menuitem',
+        'menuitemcheckbox', 'menuitemradio', 'treeitem', 'switch', 'cell', 'gridcell', 'columnheader',
+        'rowheader', 'tooltip', 'alert', 'status']);
+    const INPUT_ROLES = {
+        button: 'button', submit: 'button', reset: 'button', image: 'button', checkbox: 'checkbox',
+        radio: 'radio', range: 'slider', number: 'spinbutton', search: 'searchbox',
+    };
+    const IMPLICIT_ROLES = {
+        BUTTON: 'button', SELECT: 'combobox', TEXTAREA: 'textbox', NAV: 'navigation', MAIN: 'main',
+        HEADER: 'banner', FOOTER: 'contentinfo', FORM: 'form', DIALOG: 'dialog', ASIDE: 'complementary',
+        H1: 'heading', H2: 'heading', H3: 'heading', H4: 'heading', H5: 'heading', H6: 'heading',
+        OPTION: 'option', SUMMARY: 'button',
+    };
+    const MAX_NAME = 80;
+
+    const clean = text => {
+        const collapsed = (text || '').replace(/\\s+/g, ' ').trim();
+        return collapsed.length > MAX_NAME ? collapsed.slice(0, MAX_NAME) + '...' : collapsed;
+    };
+
+    const roleOf = element => {
+        const explicit = (element.getAttribute('role') || '').split(' ')[0];
+        if (explicit && explicit !== 'presentation' && explicit !== 'none') return explicit;
+        const tag = element.tagName;
+        if (tag === 'A' && element.hasAttribute('href')) return 'link';
+        if (tag === 'INPUT') {
+            const type = (element.getAttribute('type') || 'text').toLowerCase();
+            if (type === 'hidden') return null;
+            return INPUT_ROLES[type] || 'textbox';
+        }
+        if (tag === 'IMG') return element.getAttribute('alt') ? 'img' : null;
+        if (IMPLICIT_ROLES[tag]) return IMPLICIT_ROLES[tag];
+        if (element.isContentEditable && !element.parentElement.isContentEditable) return 'textbox';
+        if (element.hasAttribute('onclick') || element.tabIndex >= 0 && element.hasAttribute('tabindex')) {
+            return 'button';
+        }
+        return null;
+    };
+
+    const labelText = element => {
+        const labelledBy = element.getAttribute('aria-labelledby');
+        if (labelledBy) {
+            const text = labelledBy.split(' ')
+                .map(id => document.getElementById(id))
+                .filter(Boolean)
+                .map(label => label.innerText)
+                .join(' ');
+            if (clean(text)) return text;
+        }
+        if (element.labels && element.labels.length) {
+            return [...element.labels].map(label => label.innerText).join(' ');
+        }
+        return '';
+    };
+
+    // Only a button's value is its label. Other inputs report their value separately (masked for
+    // passwords), so it is never their name.
+    const nameOf = (element, role) => clean(
+        element.getAttribute('aria-label') ||
+        labelText(element) ||
+        element.getAttribute('alt') ||
+        (NAME_FROM_CONTENT.has(role) ? element.innerText : '') ||
+        element.getAttribute('title') ||
+        element.getAttribute('placeholder') ||
+        (element.tagName === 'INPUT' && ['button', 'submit', 'reset'].includes(element.type) ? element.value : '')
+    );
+
+    const isVisible = element => {
+        if (element.getAttribute('aria-hidden') === 'true') return false;
+        const style = getComputedStyle(element);
+        if (style.display === 'none' || style.visibility === 'hidden' || style.opacity === '0') return false;
+        const rect = element.getBoundingClientRect();
+        return rect.width > 0 && rect.height > 0;
+    };
+"""
+
+# Collects a pruned accessibility outline of the part of the page in the viewport: interactive
+# elements, headings, landmarks and short text, each with its role, accessible name, value, state
+# and center point and size in CSS pixels.
+# Every element included gets a `data-agent-ref` attribute with a number that stays the same for
+# as long as the element exists, so later actions can target it by ref. Refs are assigned in
+# document order, so a fresh load of the same page gets the same refs; `documentId` tells
+# documents (and so ref numberings) apart. Returns at most `maxNodes` nodes; `depth` is the number
+# of included ancestors, for indenting the outline.
+ACCESSIBILITY_SNAPSHOT = """
+(maxNodes) => {
+""" + _ELEMENT_HELPERS + """
+    const CONTAINER_ROLES = new Set(['navigation', 'main', 'banner', 'contentinfo', 'form', 'search',
+        'dialog', 'alertdialog', 'region', 'complementary', 'menu', 'menubar', 'tablist', 'list',
+        'alert', 'status']);
+
+    const valueOf = (element, role) => {
+        if (element.tagName === 'SELECT') {
+            return clean([...element.selectedOptions].map(option => option.text).join(', '));
+        }
+        if (element.tagName === 'INPUT' || element.tagName === 'TEXTAREA') {
+            if (['checkbox', 'radio', 'button'].includes(role)) return null;
+            if ((element.getAttribute('type') || '').toLowerCase() === 'password') {
+                return element.value ? '********' : '';
+            }
+            return clean(element.value);
+        }
+        if (role === 'textbox' && element.isContentEditable) return clean(element.innerText);
+        return null;
+    };
+
+    const ownText = element => clean([...element.childNodes]
+        .filter(child => child.nodeType === Node.TEXT_NODE)
+        .map(child => child.textContent)
+        .join(' '));
+
+    if (window.__agentNextRef === undefined) {
+        window.__agentNextRef = 1;
+        window.__agentDocumentId = Math.random().toString(36).slice(2);
+    }
+    const nodes = [];
+    let truncated = false;
+
+    const visit = (element, depth) => {
+        if (truncated) return;
+        if (['SCRIPT', 'STYLE', 'NOSCRIPT', 'TEMPLATE', 'SVG'].includes(element.tagName.toUpperCase())) return;
+        if (!isVisible(element)) {
+            // display: contents and similar boxes have no size but can hold visible children
+            if (getComputedStyle(element).display !== 'contents') return;
+        }
+
+        let role = roleOf(element);
+        let name = '';
+        if (role) {
+            name = nameOf(element, role);
+        } else {
+            const text = ownText(element);
+            if (text) {
+                role = 'text';
+                name = text;
+            }
+        }
+        const rect = element.getBoundingClientRect();
+        const inViewport = rect.bottom > 0 && rect.right > 0 &&
+            rect.top < window.innerHeight && rect.left < window.innerWidth;
+        const included = Boolean(role) && inViewport && (
+            INTERACTIVE_ROLES.has(role) || CONTAINER_ROLES.has(role) || role === 'heading' ||
+            role === 'img' || role === 'text' || element.hasAttribute('role')
+        );
+
+        if (included) {
+            if (nodes.length >= maxNodes) {
+                truncated = true;
+                return;
+            }
+            if (!element.dataset.agentRef) element.dataset.agentRef = String(window.__agentNextRef++);
+            const node = {
+                ref: Number(element.dataset.agentRef),
+                role,
+                name,
+                depth,
+                x: Math.round(rect.left + rect.width / 2),
+                y: Math.round(rect.top + rect.height / 2),
+                width: Math.round(rect.width),
+                height: Math.round(rect.height),
+            };
+            const value = valueOf(element, role);
+            if (value !== null) node.value = value;
+            if (role === 'heading') node.level = Number(element.tagName[1]) || Number(element.getAttribute('aria-level')) || null;
+            if ('checked' in element && ['checkbox', 'radio', 'switch'].includes(role)) node.checked = element.checked;
+            else if (element.getAttribute('aria-checked')) node.checked = element.getAttribute('aria-checked') === 'true';
+            if (element.disabled || element.getAttribute('aria-disabled') === 'true') node.disabled = true;
+            if (element.getAttribute('aria-expanded')) node.expanded = element.getAttribute('aria-expanded') === 'true';
+            if (element === document.activeElement) node.focused = true;
+            nodes.push(node);
+        }
+
+        // The name of a control already covers its text
+        if (included && (INTERACTIVE_ROLES.has(role) && role !== 'listbox' || role === 'heading' || role === 'img')) return;
+        for (const child of element.children) visit(child, included ? depth + 1 : depth);
+    };
+
+    visit(document.body, 0);
+    return {
+        documentId: window.__agentDocumentId,
+        nodes,
+        truncated,
+        scrollY: Math.round(window.scrollY),
+        pageHeight: Math.round(document.documentElement.scrollHeight),
+    };
+}
+"""
+
+# Describes the element an action targets: the one with the given agent ref, else the control at
+# viewport point (x, y) (climbing from an inner icon or label text to the control it belongs to),
+# else the focused element. Returns null if there is none, otherwise the element's role, name and
+# state plus `candidates`: ways to locate it, most robust first, each of them unique on the page
+# when the script ran. Test ids come first, then role and accessible name, placeholder, a stable
+# id, exact text and finally a CSS path.
+ELEMENT_LOCATORS = """
+([x, y, ref]) => {
+""" + _ELEMENT_HELPERS + """
+    const TEST_ID_ATTRIBUTES = ['data-testid', 'data-test-id', 'data-test', 'data-qa', 'data-cy'];
+    // Ids with long digit runs, hex strings or React's useId format change between page loads
+    const GENERATED_ID = /\\d{3,}|^[a-f0-9-]{12,}$|^:r/i;
+    // Roles whose fallback name is their current value, which is no good for finding them again
+    const VALUE_ROLES = new Set(['textbox', 'searchbox', 'combobox', 'spinbutton']);
+
+    let element = null;
+    if (ref !== null) {
+        element = document.querySelector(`[data-agent-ref="${ref}"]`);
+    } else if (x !== null) {
+        element = document.elementFromPoint(x, y);
+        for (let ancestor = element, level = 0; ancestor && level < 5; ancestor = ancestor.parentElement, level++) {
+            if (INTERACTIVE_ROLES.has(roleOf(ancestor))) {
+                element = ancestor;
+                break;
+            }
+        }
+    } else {
+        element = document.activeElement;
+    }
+    if (!element || element === document.body || element === document.documentElement) return null;
+
+    const unique = selector => {
+        try {
+            return document.querySelectorAll(selector).length === 1;
+        } catch (error) {
+            return false;
+        }
+    };
+    const stableId = node => node.id && !GENERATED_ID.test(node.id) && unique(`#${CSS.escape(node.id)}`);
+    const collapse = text => (text || '').replace(/\\s+/g, ' ').trim();
+
+    const candidates = [];
+    for (const attribute of TEST_ID_ATTRIBUTES) {
+        const value = element.getAttribute(attribute);
+        const selector = `[${attribute}="${CSS.escape(value || '')}"]`;
+        if (value && unique(selector)) {
+            candidates.push(attribute === 'data-testid' ? { kind: 'test_id', value } : { kind: 'css', value: selector });
+        }
+    }
+
+    const role = roleOf(element);
+    const name = role ? nameOf(element, role) : '';
+    if (role && name && !(VALUE_ROLES.has(role) && name === clean(element.value))) {
+        let matches = 0;
+        for (const other of document.querySelectorAll('*')) {
+            if (roleOf(other) === role && isVisible(other) && nameOf(other, role) === name) matches++;
+            if (matches > 1) break;
+        }
+        if (matches === 1) {
+            // A cut name still finds the element as a substring
+            const cut = name.length > MAX_NAME;
+            candidates.push({ kind: 'role', role, name: cut ? name.slice(0, MAX_NAME) : name, exact: !cut });
+        }
+    }
+
+    const placeholder = element.getAttribute('placeholder');
+    if (placeholder && unique(`[placeholder="${CSS.escape(placeholder)}"]`)) {
+        candidates.push({ kind: 'placeholder', value: placeholder });
+    }
+
+    if (stableId(element)) candidates.push({ kind: 'css', value: `#${CSS.escape(element.id)}` });
+
+    const text = collapse(element.textContent);
+    if (!role && text && text.length <= MAX_NAME) {
+        // The innermost elements with exactly this text, which is what exact text matching finds
+        let matches = 0;
+        for (const other of document.body.querySelectorAll('*')) {
+            if (collapse(other.textContent) === text &&
+                ![...other.children].some(child => collapse(child.textContent) === text)) matches++;
+            if (matches > 1) break;
+        }
+        if (matches === 1) candidates.push({ kind: 'text', value: text });
+    }
+
+    const path = [];
+    for (let node = element; node && node !== document.documentElement; node = node.parentElement) {
+        if (stableId(node)) {
+            path.unshift(`#${CSS.escape(node.id)}`);
+            break;
+        }
+        const tag = node.tagName.toLowerCase();
+        const siblings = node.parentElement
+            ? [...node.parentElement.children].filter(sibling => sibling.tagName === node.tagName)
+            : [node];
+        path.unshift(siblings.length > 1 ? `${tag}:nth-of-type(${siblings.indexOf(node) + 1})` : tag);
+    }
+    const cssPath = path.join(' > ');
+    if (!candidates.some(candidate => candidate.value === cssPath)) candidates.push({ kind: 'css', value: cssPath });
+
+    const isField = ['INPUT', 'TEXTAREA', 'SELECT'].includes(element.tagName);
+    return {
+        candidates,
+        role,
+        name,
+        visible: isVisible(element),
+        text: collapse(element.innerText),
+        value: isField ? element.value : null,
+        checked: element.tagName === 'INPUT' ? element.checked : null,
+    };
+}
+"""
+
+# Init script turning off CSS animations, transitions and smooth scrolling. Runs before any of the
+# page's own scripts, when the document may not have a root element yet.
+DISABLE_ANIMATIONS = """
+(() => {
+    const inject = () => {
+        const style = document.createElement('style');
+        style.textContent = `
+            *, *::before, *::after {
+                animation-duration: 0s !important;
+                animation-delay: 0s !important;
+                transition-duration: 0s !important;
+                transition-delay: 0s !important;
+                caret-color: transparent !important;
+                scroll-behavior: auto !important;
+            }
+        `;
+        (document.head || document.documentElement).appendChild(style);
+    };
+    if (document.documentElement) {
+        inject();
+    } else {
+        new MutationObserver((_, observer) => {
+            if (document.documentElement) {
+                observer.disconnect();
+                inject();
+            }
+        }).observe(document, { childList: true });
+    }
+})()
+"""
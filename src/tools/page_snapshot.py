@@ -0,0 +1,126 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+# Element properties whose change is reported; position changes (e.g. from scrolling) are not,
+# the scroll position is reported once instead
+STATE_KEYS = ("role", "name", "value", "checked", "expanded", "disabled", "focused")
+
+# Scales viewport coordinates to the screenshot pixels the model acts in
+Scale = Callable[[int, int], tuple[int, int]]
+
+
+@dataclass
+class PageSnapshot:
+    """The accessibility outline of the viewport at one point in time, as collected by ACCESSIBILITY_SNAPSHOT."""
+    document_id: str
+    url: str
+    title: str
+    nodes: list[dict[str, Any]]
+    truncated: bool = False
+    scroll_y: int = 0
+    page_height: int = 0
+    by_ref: dict[int, dict[str, Any]] = field(init=False, repr=False)
+
+    def __post_init__(self):
+        self.by_ref = {node["ref"]: node for node in self.nodes}
+
+    @classmethod
+    def from_page_result(cls, result: dict[str, Any], url: str, title: str) -> "PageSnapshot":
+        return cls(
+            document_id=result["documentId"],
+            url=url,
+            title=title,
+            nodes=result["nodes"],
+            truncated=result["truncated"],
+            scroll_y=result["scrollY"],
+            page_height=result["pageHeight"],
+        )
+
+    def format(self, scale: Scale) -> str:
+        """Format the snapshot as an indented outline."""
+        _, scroll_y = scale(0, self.scroll_y)
+        _, page_height = scale(0, self.page_height)
+        lines = [f"Page: {self.title} ({self.url}), scrolled to {scroll_y} of {page_height}"]
+        lines += ["  " * node["depth"] + "- " + format_node(node, scale) for node in self.nodes]
+        if self.truncated:
+            lines.append(f"[Only the first {len(self.nodes)} elements are listed]")
+        return "\n".join(lines)
+
+
+def format_node(node: dict[str, Any], scale: Scale) -> str:
+    """Describe a snapshot element on one line, with its center in screenshot pixels."""
+    line = node["role"]
+    if node["name"]:
+        line += f' "{node["name"]}"'
+    if node.get("level"):
+        line += f" level={node['level']}"
+    if "value" in node:
+        line += f' value="{node["value"]}"'
+    if "checked" in node:
+        line += " checked" if node["checked"] else " unchecked"
+    if "expanded" in node:
+        line += " expanded" if node["expanded"] else " collapsed"
+    if node.get("disabled"):
+        line += " disabled"
+    if node.get("focused"):
+        line += " focused"
+    x, y = scale(node["x"], node["y"])
+    return line + f" [ref={node['ref']}] at ({x}, {y})"
+
+
+def describe_changes(
+        before: PageSnapshot,
+        after: PageSnapshot,
+        scale: Scale,
+        dialogs: list[str] | None = None,
+        max_lines: int = 20
+) -> str:
+    """
+    Describe how the page changed between two snapshots, in at most `max_lines` change lines.
+
+    Lists URL and title changes, dialogs that opened, the new scroll position, and elements that
+    appeared in (+), left (-) or changed state (including focus) in (~) the viewport. A new
+    document is summarized by its first elements.
+    """
+    lines = []
+    if after.url != before.url:
+        lines.append(f"URL: {before.url} -> {after.url}")
+    if after.title != before.title:
+        lines.append(f'Title: "{before.title}" -> "{after.title}"')
+    lines += [f"Dialog: {dialog}" for dialog in dialogs or []]
+
+    if after.document_id == before.document_id and after.scroll_y != before.scroll_y:
+        _, scroll_y = scale(0, after.scroll_y)
+        _, page_height = scale(0, after.page_height)
+        lines.append(f"Scrolled to {scroll_y} of {page_height}")
+
+    if after.document_id != before.document_id:
+        lines.append("New page loaded:")
+        changes = [f"+ {format_node(node, scale)}" for node in after.nodes]
+    else:
+        changes = []
+        for node in after.nodes:
+            old = before.by_ref.get(node["ref"])
+            if old is None:
+                changes.append(f"+ {format_node(node, scale)}")
+                continue
+            changed = [key for key in STATE_KEYS if old.get(key) != node.get(key)]
+            if changed:
+                detail = ", ".join(f"{key} {old.get(key)!r} -> {node.get(key)!r}" for key in changed)
+                changes.append(f"~ {_label(node)}: {detail}")
+        changes += [f"- {_label(node)}" for node in before.nodes if node["ref"] not in after.by_ref]
+
+    if len(changes) > max_lines:
+        changes = changes[:max_lines] + [
+            f"... and {len(changes) - max_lines} more changes. Take a snapshot to see the whole page."
+        ]
+    lines += changes
+    if not lines:
+        return "Page changes: none visible."
+    return "Page changes:\n" + "\n".join(lines)
+
+
+def _label(node: dict[str, Any]) -> str:
+    """Identify a snapshot element in a change line."""
+    name = f' "{node["name"]}"' if node["name"] else ""
+    return f"{node['role']}{name} [ref={node['ref']}]"
@@ -0,0 +1,150 @@
+import base64
+import hashlib
+import io
+import json
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Literal
+
+from PIL import Image
+
+MEDIA_TYPES = {
+    "png": "image/png",
+    "jpeg": "image/jpeg",
+    "webp": "image/webp",
+}
+EXTENSIONS = {media_type: "jpg" if image_format == "jpeg" else image_format for image_format, media_type in MEDIA_TYPES.items()}
+
+# Frames are compared on a small grayscale thumbnail so that compression noise, a blinking
+# caret or a single changed glyph doesn't count as a visual change
+SIGNATURE_SIZE = (64, 64)
+PIXEL_CHANGE_LEVEL = 16
+
+
+@dataclass(frozen=True)
+class ScreenshotConfig:
+    """
+    How screenshots are encoded before being sent to the model.
+
+    Screenshots are downscaled to fit within `max_width` x `max_height` (keeping the aspect
+    ratio) and encoded as `image_format`; `quality` applies to JPEG and WebP. Set either
+    dimension to None to keep the full resolution.
+
+    With `skip_unchanged`, a screenshot whose frame differs from the last one sent in at most
+    `change_threshold` (a fraction) of its signature pixels is reported as unchanged instead of
+    being sent again.
+    """
+    max_width: int | None = 1280
+    max_height: int | None = 800
+    image_format: Literal["png", "jpeg", "webp"] = "png"
+    quality: int = 80
+    save_to_disk: bool = True
+    skip_unchanged: bool = True
+    change_threshold: float = 0.001
+
+    @property
+    def media_type(self) -> str:
+        """The media type of encoded screenshots."""
+        return MEDIA_TYPES[self.image_format]
+
+    @property
+    def extension(self) -> str:
+        """The file extension of encoded screenshots."""
+        return EXTENSIONS[self.media_type]
+
+    def target_size(self, width: int, height: int) -> tuple[int, int]:
+        """Return the size a width x height screenshot is scaled to."""
+        scale = 1.0
+        if self.max_width:
+            scale = min(scale, self.max_width / width)
+        if self.max_height:
+            scale = min(scale, self.max_height / height)
+        return max(round(width * scale), 1), max(round(height * scale), 1)
+
+
+@dataclass(frozen=True)
+class EncodedScreenshot:
+    """A screenshot encoded for the model."""
+    data: bytes
+    base64_data: str
+    media_type: str
+    width: int
+    height: int
+
+
+def encode_screenshot(png_bytes: bytes, config: ScreenshotConfig) -> EncodedScreenshot:
+    """
+    Downscale and re-encode a PNG screenshot according to `config`.
+
+    This is CPU bound, so callers on the event loop should run it in a worker thread.
+    """
+    image = Image.open(io.BytesIO(png_bytes))
+    target_size = config.target_size(*image.size)
+
+    if target_size == image.size and config.image_format == "png":
+        data = png_bytes
+    else:
+        if target_size != image.size:
+            image = image.resize(target_size, Image.Resampling.LANCZOS)
+        if config.image_format == "jpeg":
+            image = image.convert("RGB")
+        buffer = io.BytesIO()
+        if config.image_format == "png":
+            image.save(buffer, format="PNG")
+        else:
+            image.save(buffer, format=config.image_format.upper(), quality=config.quality)
+        data = buffer.getvalue()
+
+    return EncodedScreenshot(
+        data=data,
+        base64_data=base64.b64encode(data).decode('utf-8'),
+        media_type=config.media_type,
+        width=target_size[0],
+        height=target_size[1],
+    )
+
+
+def frame_signature(png_bytes: bytes) -> bytes:
+    """Return a small grayscale thumbnail of a screenshot used to detect visual changes."""
+    image = Image.open(io.BytesIO(png_bytes)).convert("L")
+    return image.resize(SIGNATURE_SIZE, Image.Resampling.BILINEAR).tobytes()
+
+
+def frame_changed(previous: bytes | None, current: bytes, threshold: float) -> bool:
+    """Check whether two frame signatures differ in more than `threshold` of their pixels."""
+    if previous is None or len(previous) != len(current):
+        return True
+    changed = sum(1 for a, b in zip(previous, current) if abs(a - b) > PIXEL_CHANGE_LEVEL)
+    return changed > threshold * len(current)
+
+
+class ScreenshotStore:
+    """
+    Content-addressed store for the screenshots of all runs.
+
+    Each distinct screenshot is written once as `<sha256>.<ext>` in the store directory, and
+    every run appends one line per screenshot to its own manifest in `runs/<run_id>.jsonl`.
+    Methods do blocking file I/O; call them from a worker thread when on the event loop.
+    """
+
+    def __init__(self, root: Path, run_id: str):
+        self.root = Path(root)
+        self.run_id = run_id
+        self.manifest_path = self.root / "runs" / f"{run_id}.jsonl"
+        self.manifest_path.parent.mkdir(parents=True, exist_ok=True)
+
+    def save(self, screenshot: EncodedScreenshot, **metadata: Any) -> Path:
+        """Store a screenshot (if not stored already), record it in the run manifest and return its path."""
+        digest = hashlib.sha256(screenshot.data).hexdigest()
+        path = self.root / f"{digest}.{EXTENSIONS[screenshot.media_type]}"
+        if not path.exists():
+            path.write_bytes(screenshot.data)
+        self.record(path, sha256=digest, width=screenshot.width, height=screenshot.height, **metadata)
+        return path
+
+    def record(self, path: Path, **metadata: Any) -> None:
+        """Append an entry for an already stored screenshot to the run manifest."""
+        entry = {"time": datetime.now().isoformat(), "file": path.name, **metadata}
+        with open(self.manifest_path, 'a', encoding='utf-8') as file:
+            file.write(json.dumps(entry) + "\n")
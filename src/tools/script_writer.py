@@ -1,6 +1,6 @@
 from .base import BaseAnthropicTool, ToolResult
 from pathlib import Path
-from typing import Literal
+from typing import Any, Literal
 
 class ScriptWriterTool(BaseAnthropicTool):
     "Allows for agent to write script files"
@@ -11,6 +11,13 @@ class ScriptWriterTool(BaseAnthropicTool):
         self.output_dir = Path(output_dir)
         self.output_dir.mkdir(parents=True, exist_ok=True)
 
+    def resource_access(self, tool_input: dict[str, Any]) -> tuple[str, bool]:
+        """Writes to different files are independent of each other."""
+        path = Path(tool_input.get("path") or "")
+        if not path.is_absolute():
+            path = self.output_dir / path
+        return f"{self.name}:{path.resolve()}", False
+
     async def __call__(self, **kwargs) -> ToolResult:
         """Write content to a file"""
         action = kwargs.get("action")
@@ -0,0 +1,87 @@
+import hashlib
+import json
+from dataclasses import dataclass, asdict, field
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Optional
+
+TRAJECTORY_DIR = Path("../trajectories")
+
+
+@dataclass
+class TrajectoryStep:
+    """A browser action as executed during a run, with the page state around it."""
+    tool_input: dict[str, Any]
+    duration: float
+    url_before: str
+    fingerprint_before: str
+    url_after: str
+    fingerprint_after: str
+    output: Optional[str] = None
+    # Key of the element the action targeted in the locator cache
+    target: Optional[str] = None
+
+
+@dataclass
+class Trajectory:
+    """The browser actions of a run, keyed by the test it ran."""
+    website: str
+    instructions: str
+    prompt_type: str
+    steps: list[TrajectoryStep] = field(default_factory=list)
+    final_message: str = ''
+    recorded_at: str = ''
+
+    @property
+    def key(self) -> str:
+        """Key of the test this trajectory belongs to."""
+        return trajectory_key(self.website, self.instructions)
+
+    def describe_steps(self, count: int) -> str:
+        """Describe the first `count` steps as a numbered list for the model."""
+        return "\n".join(
+            f"{index}. {json.dumps(step.tool_input)}"
+            for index, step in enumerate(self.steps[:count], start=1)
+        )
+
+
+@dataclass
+class ReplayOutcome:
+    """How far a trajectory replay got."""
+    completed: bool
+    steps_replayed: int
+    reason: str = ''
+    # Recorded assertions replayed; a failing one stops the replay, so all of these held
+    assertions: int = 0
+
+
+def trajectory_key(website: str, instructions: str) -> str:
+    """Return a stable key for a test, derived from its website and (whitespace-normalized) instructions."""
+    normalized = json.dumps([website.strip(), " ".join(instructions.split())])
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def trajectory_path(website: str, instructions: str, trajectory_dir: Path = TRAJECTORY_DIR) -> Path:
+    """Return the file a test's trajectory is stored in."""
+    return Path(trajectory_dir) / f"{trajectory_key(website, instructions)}.json"
+
+
+def save_trajectory(trajectory: Trajectory, trajectory_dir: Path = TRAJECTORY_DIR) -> Path:
+    """Write a trajectory to disk, replacing any earlier trajectory for the same test."""
+    path = trajectory_path(trajectory.website, trajectory.instructions, trajectory_dir)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    trajectory.recorded_at = datetime.now().isoformat()
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(asdict(trajectory), file, indent=2)
+    return path
+
+
+def load_trajectory(website: str, instructions: str, trajectory_dir: Path = TRAJECTORY_DIR) -> Optional[Trajectory]:
+    """Load the stored trajectory for a test, if there is one."""
+    path = trajectory_path(website, instructions, trajectory_dir)
+    if not path.exists():
+        return None
+    with open(path, 'r', encoding='utf-8') as file:
+        data = json.load(file)
+    data['steps'] = [TrajectoryStep(**step) for step in data['steps']]
+    return Trajectory(**data)
@@ -0,0 +1,60 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Optional
+
+_current_metrics: ContextVar[Optional["RunMetrics"]] = ContextVar("current_metrics", default=None)
+
+
+@dataclass
+class RunMetrics:
+    """Timings and counters collected while a run executes."""
+    timings: dict[str, list[float]] = field(default_factory=lambda: defaultdict(list))
+    counters: dict[str, float] = field(default_factory=lambda: defaultdict(float))
+
+    def summary(self) -> dict[str, Any]:
+        """Return the collected metrics as a JSON-serializable dict."""
+        return {
+            "timings": {
+                name: {
+                    "count": len(durations),
+                    "total": sum(durations),
+                    "mean": sum(durations) / len(durations),
+                    "max": max(durations),
+                    "values": durations,
+                }
+                for name, durations in sorted(self.timings.items())
+            },
+            "counters": dict(sorted(self.counters.items())),
+        }
+
+
+@contextmanager
+def collect_metrics() -> Iterator[RunMetrics]:
+    """
+    Collect metrics recorded by `util.tracing.span` and `increment` within this block.
+
+    Collection follows the current context, so tasks and worker threads started inside the
+    block report to it while concurrent runs each keep their own metrics.
+    """
+    metrics = RunMetrics()
+    token = _current_metrics.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_metrics.reset(token)
+
+
+def record_timing(name: str, seconds: float) -> None:
+    """Record a duration measured elsewhere under `name`, if metrics are being collected."""
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.timings[name].append(seconds)
+
+
+def increment(name: str, amount: float = 1) -> None:
+    """Add `amount` to the counter `name`, if metrics are being collected."""
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.counters[name] += amount
@@ -1,3 +1,5 @@
+import json
+from pathlib import Path
 
 
 def read_test_file(file_path):
@@ -12,4 +14,34 @@ def read_test_file(file_path):
     return {
         'website': website,
         'instructions': instructions
-    }
\ No newline at end of file
+    }
+
+
+def read_test_cases(path):
+    """
+    Read a suite of test cases from a directory of test files or a JSONL file.
+
+    A directory is read as one test per `*.txt` file (same format as `test.txt`), named after
+    the file. A JSONL file holds one object per line with `website` and `instructions` keys and
+    optional `name`, `prompt_type` and `profile` (browser profile name) keys.
+    """
+    path = Path(path)
+    test_cases = []
+
+    if path.is_dir():
+        for test_path in sorted(path.glob('*.txt')):
+            test = read_test_file(test_path)
+            test['name'] = test_path.stem
+            test_cases.append(test)
+        return test_cases
+
+    with open(path, 'r') as file:
+        for line_number, line in enumerate(file, start=1):
+            if not line.strip():
+                continue
+            test = json.loads(line)
+            if 'website' not in test or 'instructions' not in test:
+                raise ValueError(f"{path}:{line_number}: test case needs 'website' and 'instructions'")
+            test.setdefault('name', f"{path.stem}_{line_number}")
+            test_cases.append(test)
+    return test_cases
@@ -0,0 +1,206 @@
+import asyncio
+import itertools
+import json
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterator, Optional, TextIO
+
+from util.metrics import record_timing
+
+TRACE_DIR = Path("../traces")
+
+_current_tracer: ContextVar[Optional["Tracer"]] = ContextVar("current_tracer", default=None)
+_current_span: ContextVar[Optional["Span"]] = ContextVar("current_span", default=None)
+
+
+@dataclass
+class Span:
+    """A timed operation within a run. `start` is in seconds since the run's trace started."""
+    name: str
+    span_id: int
+    parent_id: Optional[int]
+    start: float
+    track: str
+    duration: float = 0.0
+    attributes: dict[str, Any] = field(default_factory=dict)
+
+    def set(self, **attributes: Any) -> None:
+        """Add attributes to the span."""
+        self.attributes.update(attributes)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "name": self.name,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "start": round(self.start, 6),
+            "duration": round(self.duration, 6),
+            "track": self.track,
+            "attributes": self.attributes,
+        }
+
+
+class Tracer:
+    """
+    Writes the spans of one run to a JSONL file, one line per span as it finishes.
+
+    Spans are nested by context: a span started inside another one (including in tasks and worker
+    threads started inside it) records it as its parent. The track of a span is the asyncio task
+    or thread it ran on, so concurrent tool calls show up side by side in a trace viewer.
+    """
+
+    def __init__(self, run_id: str, trace_dir: Path = TRACE_DIR):
+        self.run_id = run_id
+        self.path = Path(trace_dir) / f"{run_id}.jsonl"
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._origin = time.perf_counter()
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._file: TextIO = open(self.path, 'w', encoding='utf-8')
+
+    def now(self) -> float:
+        """Seconds since the trace started."""
+        return time.perf_counter() - self._origin
+
+    def start_span(self, name: str, attributes: dict[str, Any]) -> Span:
+        parent = _current_span.get()
+        return Span(
+            name=name,
+            span_id=next(self._ids),
+            parent_id=parent.span_id if parent else None,
+            start=self.now(),
+            track=_current_track(),
+            attributes=attributes,
+        )
+
+    def finish_span(self, span: Span) -> None:
+        span.duration = self.now() - span.start
+        line = json.dumps({"run_id": self.run_id, **span.to_dict()}, default=str)
+        with self._lock:
+            if not self._file.closed:
+                self._file.write(line + "\n")
+                self._file.flush()
+
+    def close(self) -> None:
+        with self._lock:
+            self._file.close()
+
+
+@contextmanager
+def trace_run(run_id: str, trace_dir: Path = TRACE_DIR, chrome_trace: bool = False, **attributes: Any) -> Iterator[Tracer]:
+    """
+    Trace the spans started within this block to `<trace_dir>/<run_id>.jsonl`.
+
+    The whole block is recorded as a root `run` span carrying `attributes`.
+
+    Args:
+        run_id: Names the trace file
+        trace_dir: Directory the trace files are written to
+        chrome_trace: Also export the trace in Chrome trace event format to
+            `<trace_dir>/<run_id>.trace.json` when the block exits
+        attributes: Attributes of the root span
+    """
+    tracer = Tracer(run_id, trace_dir)
+    token = _current_tracer.set(tracer)
+    try:
+        with span("run", run_id=run_id, **attributes):
+            yield tracer
+    finally:
+        _current_tracer.reset(token)
+        tracer.close()
+        if chrome_trace:
+            export_chrome_trace(tracer.path)
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Span]:
+    """
+    Time the block as a span named `name`, and record its duration in the run metrics.
+
+    Outside of a traced run the span is not written anywhere, but can still be given attributes.
+    """
+    tracer = _current_tracer.get()
+    if tracer is None:
+        current = Span(name=name, span_id=0, parent_id=None, start=0.0, track="", attributes=attributes)
+    else:
+        current = tracer.start_span(name, attributes)
+    token = _current_span.set(current)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException as e:
+        current.set(error=type(e).__name__)
+        raise
+    finally:
+        duration = time.perf_counter() - start
+        _current_span.reset(token)
+        record_timing(name, duration)
+        if tracer is not None:
+            tracer.finish_span(current)
+
+
+def current_span() -> Optional[Span]:
+    """Return the innermost active span, if any."""
+    return _current_span.get()
+
+
+def since_span_start(target: Span) -> float:
+    """Seconds since `target` started, for attributes marking points within a span."""
+    tracer = _current_tracer.get()
+    return round(tracer.now() - target.start, 6) if tracer else 0.0
+
+
+def export_chrome_trace(trace_path: Path, output_path: Optional[Path] = None) -> Path:
+    """
+    Convert a JSONL trace to the Chrome trace event format, viewable in chrome://tracing,
+    Perfetto or speedscope.
+
+    Args:
+        trace_path: The JSONL trace written by `trace_run`
+        output_path: Where to write the JSON. Defaults to the trace path with a `.trace.json` suffix.
+
+    Returns:
+        The path of the written file
+    """
+    trace_path = Path(trace_path)
+    output_path = Path(output_path) if output_path else trace_path.with_suffix(".trace.json")
+    with open(trace_path, 'r', encoding='utf-8') as file:
+        spans = [json.loads(line) for line in file if line.strip()]
+
+    tracks: dict[str, int] = {}
+    events = []
+    for entry in sorted(spans, key=lambda s: s["start"]):
+        tid = tracks.setdefault(entry["track"], len(tracks) + 1)
+        events.append({
+            "name": entry["name"],
+            "cat": entry["name"].split(".")[0],
+            "ph": "X",
+            "ts": entry["start"] * 1_000_000,
+            "dur": entry["duration"] * 1_000_000,
+            "pid": 1,
+            "tid": tid,
+            "args": entry["attributes"],
+        })
+    for track, tid in tracks.items():
+        events.append({"name": "thread_name", "ph": "M", "pid": 1, "tid": tid, "args": {"name": track}})
+    if spans:
+        events.append({"name": "process_name", "ph": "M", "pid": 1, "args": {"name": spans[0]["run_id"]}})
+
+    with open(output_path, 'w', encoding='utf-8') as file:
+        json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+    return output_path
+
+
+def _current_track() -> str:
+    """Name the asyncio task or thread the caller runs on."""
+    try:
+        task = asyncio.current_task()
+    except RuntimeError:
+        task = None
+    if task is not None:
+        return task.get_name()
+    return threading.current_thread().name